@@ -15,3 +15,4 @@ admin.site.register(Order)
 admin.site.register(ShopItem)
 admin.site.register(StudentListedShopItem)
 admin.site.register(ShopOrder)
+admin.site.register(StripeEvent)
@@ -0,0 +1,173 @@
+"""
+Read-only JSON catalog API (api/v1/) for the kiosk and mobile clients.
+
+Every response carries a strong ETag built from the catalog version, which
+item and category writes bump, so a poll with a matching If-None-Match is
+answered 304 from the cache without touching the database.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_safe
+
+from .catalog import get_catalog_version
+from .models import Category, ShopItem, StudentListedShopItem
+from .pagination import keyset_page
+
+API_VERSION = "v1"
+
+
+def _image_url(item):
+    return item.image.url if item.image else None
+
+
+def _images(item):
+    return [
+        {"url": d.image.url, "width": d.width, "format": d.format}
+        for d in sorted(item.derivatives.all(), key=lambda d: (d.format, d.width))
+        if d.source == item.image.name
+    ]
+
+
+def _price(item):
+    return str(item.price)
+
+
+def _created_at(item):
+    return item.created_at.isoformat()
+
+
+# Field name -> (columns it reads, value). "images" lists the resized copies.
+SHOP_ITEM_FIELDS = {
+    "id": (("id",), lambda item: item.pk),
+    "name": (("name",), lambda item: item.name),
+    "description": (("description",), lambda item: item.description or ""),
+    "price": (("price",), _price),
+    "category_id": (("category",), lambda item: item.category_id),
+    "vendor_id": (("vendor",), lambda item: item.vendor_id),
+    "image": (("image",), _image_url),
+    "images": (("image",), _images),
+    "created_at": (("created_at",), _created_at),
+}
+STUDENT_ITEM_FIELDS = {
+    **{name: field for name, field in SHOP_ITEM_FIELDS.items() if name != "vendor_id"},
+    "student_id": (("student_vendor",), lambda item: item.student_vendor_id),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def catalog_etag(request, *args, **kwargs):
+    # The query string is part of the URL, so one version covers every page and field set
+    return f"catalog-{API_VERSION}-{get_catalog_version()}"
+
+
+def api_view(view_func):
+    """GET/HEAD-only, ETag-validated JSON view; ``ApiError`` becomes an error response."""
+    @wraps(view_func)
+    @require_safe
+    @etag(catalog_etag)
+    @cache_control(public=True, no_cache=True)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return JsonResponse(view_func(request, *args, **kwargs))
+        except ApiError as e:
+            return JsonResponse({"error": str(e)}, status=e.status)
+    return wrapper
+
+
+def _selected_fields(request, available):
+    requested = request.GET.get("fields")
+    if not requested:
+        return list(available)
+    names = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def _queryset(model, available, names):
+    columns = {"id", "created_at"}  # always read: they make up the page cursor
+    for name in names:
+        columns.update(available[name][0])
+    queryset = model.objects.filter(status="active").only(*columns)
+    if "images" in names:
+        queryset = queryset.prefetch_related("derivatives")
+    return queryset
+
+
+def _serialize(item, available, names):
+    return {name: available[name][1](item) for name in names}
+
+
+def _item_list(request, model, available):
+    names = _selected_fields(request, available)
+    items = _queryset(model, available, names)
+    category_id = request.GET.get("category")
+    if category_id:
+        if not category_id.isdigit():
+            raise ApiError("Invalid category")
+        items = items.filter(category_id=int(category_id))
+    limit = request.GET.get("limit", "")
+    if limit:
+        if not limit.isdigit() or not 1 <= int(limit) <= settings.API_MAX_PAGE_SIZE:
+            raise ApiError(f"limit must be between 1 and {settings.API_MAX_PAGE_SIZE}")
+        limit = int(limit)
+    else:
+        limit = settings.API_PAGE_SIZE
+
+    try:
+        page, next_cursor = keyset_page(items, request.GET.get("cursor"), limit)
+    except ValueError:
+        raise ApiError("Invalid cursor") from None
+
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params["cursor"] = next_cursor
+        next_url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    return {
+        "results": [_serialize(item, available, names) for item in page],
+        "next_cursor": next_cursor,
+        "next": next_url,
+    }
+
+
+def _item_detail(request, model, available, item_id):
+    names = _selected_fields(request, available)
+    item = _queryset(model, available, names).filter(pk=item_id).first()
+    if item is None:
+        raise ApiError("Not found", status=404)
+    return _serialize(item, available, names)
+
+
+@api_view
+def categories(request):
+    return {"results": list(Category.objects.order_by("name").values("id", "name"))}
+
+
+@api_view
+def shop_items(request):
+    return _item_list(request, ShopItem, SHOP_ITEM_FIELDS)
+
+
+@api_view
+def shop_item(request, item_id):
+    return _item_detail(request, ShopItem, SHOP_ITEM_FIELDS, item_id)
+
+
+@api_view
+def student_items(request):
+    return _item_list(request, StudentListedShopItem, STUDENT_ITEM_FIELDS)
+
+
+@api_view
+def student_item(request, item_id):
+    return _item_detail(request, StudentListedShopItem, STUDENT_ITEM_FIELDS, item_id)
@@ -0,0 +1,106 @@
+"""
+Automatic vendor assignment for print orders that students leave unassigned.
+
+The strategy is picked by ``settings.ORDER_ASSIGNMENT_STRATEGY``: one of the
+names in STRATEGIES, or the dotted path of a callable taking the order and
+returning a vendor id (or None).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from .counters import UNKNOWN
+from .models import CustomUser, OrderCounter
+
+ROTATION_KEY = "assignment:rotation"
+ROTATION_CURSOR_KEY = "assignment:cursor"
+
+# CustomUser fields that decide whether, and how often, a vendor is assigned orders
+ASSIGNMENT_FIELDS = ("role", "is_approved", "is_active", "assignment_weight")
+
+
+def assignable_counters():
+    """Assignable vendors' counters, fewest pending and in-progress orders first."""
+    return OrderCounter.objects.filter(assignable=True).order_by(F("total") - F("done"), "user")
+
+
+def least_outstanding(order):
+    """
+    The assignable vendor with the fewest pending and in-progress orders.
+    Reads the OrderCounter rows that Order signals keep current, walking
+    ordercounter_outstanding_idx, so the cost is one index seek. Falls back
+    to any assignable vendor when none has a counter row yet.
+    """
+    vendor_id = assignable_counters().values_list("user_id", flat=True).first()
+    if vendor_id is None:
+        vendor_id = (
+            CustomUser.objects.filter(role="vendor", is_approved=True, is_active=True, order_counter__isnull=True)
+            .order_by("id")
+            .values_list("id", flat=True)
+            .first()
+        )
+    return vendor_id
+
+
+def _smooth_rotation(weights):
+    """Nginx-style smooth weighted round robin: vendors interleaved in proportion to weight."""
+    current = {vendor_id: 0 for vendor_id in weights}
+    total = sum(weights.values())
+    rotation = []
+    for _ in range(total):
+        for vendor_id, weight in weights.items():
+            current[vendor_id] += weight
+        chosen = max(current, key=lambda vendor_id: (current[vendor_id], -vendor_id))
+        current[chosen] -= total
+        rotation.append(chosen)
+    return rotation
+
+
+def vendor_rotation():
+    """The cached weighted rotation of assignable vendors, rebuilt after vendor changes."""
+    rotation = cache.get(ROTATION_KEY)
+    if rotation is None:
+        weights = dict(
+            CustomUser.objects.filter(role="vendor", is_approved=True, is_active=True)
+            .order_by("id")
+            .values_list("id", "assignment_weight")
+        )
+        rotation = _smooth_rotation({vendor_id: max(weight, 1) for vendor_id, weight in weights.items()})
+        cache.set(ROTATION_KEY, rotation, timeout=None)
+    return rotation
+
+
+def assignment_state(user):
+    """The fields vendor assignment reads from a user, or UNKNOWN if any were deferred."""
+    values = user.__dict__
+    if any(field not in values for field in ASSIGNMENT_FIELDS):
+        return UNKNOWN
+    return tuple(values[field] for field in ASSIGNMENT_FIELDS)
+
+
+def invalidate_vendor_rotation():
+    cache.delete(ROTATION_KEY)
+
+
+def weighted_round_robin(order):
+    """Cycles through assignable vendors, each getting orders in proportion to its assignment_weight."""
+    rotation = vendor_rotation()
+    if not rotation:
+        return None
+    cache.add(ROTATION_CURSOR_KEY, 0, timeout=None)
+    position = cache.incr(ROTATION_CURSOR_KEY)
+    return rotation[position % len(rotation)]
+
+
+STRATEGIES = {
+    "least_outstanding": least_outstanding,
+    "weighted_round_robin": weighted_round_robin,
+}
+
+
+def choose_vendor(order):
+    """Returns the id of the vendor the configured strategy picks for ``order``, or None."""
+    strategy = settings.ORDER_ASSIGNMENT_STRATEGY
+    strategy = STRATEGIES.get(strategy) or import_string(strategy)
+    return strategy(order)
@@ -0,0 +1,48 @@
+"""
+Work the request shouldn't wait for (vendor deletes, image derivatives,
+document preflight, Stripe events), run once the transaction that asked
+for it commits. Each kind of work has a named thread pool and a ``*_ASYNC``
+setting; with the setting off it runs inline at commit instead, which is
+what tests and benchmarks use.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def executor(pool, workers=1):
+    """The thread pool named ``pool``, started with ``workers`` threads on first use."""
+    with _executors_lock:
+        if pool not in _executors:
+            _executors[pool] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=pool)
+        return _executors[pool]
+
+
+def run_after_commit(func, *args, async_setting, pool, workers=1):
+    """
+    Calls ``func(*args)`` once the current transaction commits: on the
+    ``pool`` thread pool when ``settings.<async_setting>`` is on, where a
+    failure is logged, otherwise inline, where it propagates.
+    """
+    if getattr(settings, async_setting):
+        transaction.on_commit(lambda: executor(pool, workers).submit(_run_in_background, func, *args))
+    else:
+        transaction.on_commit(lambda: func(*args))
+
+
+def _run_in_background(func, *args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Background %s%r failed", func.__qualname__, args)
+    finally:
+        close_old_connections()
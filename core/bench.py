@@ -0,0 +1,191 @@
+"""
+View benchmarks for ``manage.py bench_views``: every named route in
+core/urls.py is requested with the test client, as the kind of user who
+would use it, and its latency and SQL query count recorded.
+"""
+import math
+import time
+
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from . import urls
+from .models import CustomUser, Order, ShopItem, StudentListedShopItem, StudentShopOrder
+from .seeding import PLACEHOLDER_DOCUMENT, PLACEHOLDER_IMAGE
+
+ANONYMOUS, STUDENT, VENDOR, ADMIN = "anonymous", "student", "vendor", "admin"
+
+# Route name -> (user role, path kwargs from the fixtures, query string).
+# A string instead says why the route is not benchmarked.
+ROUTES = {
+    "home": (ANONYMOUS, None, ""),
+    "login": (ANONYMOUS, None, ""),
+    "logout": "logs the client out",
+    "register": (ANONYMOUS, None, ""),
+    "contact": (ANONYMOUS, None, ""),
+    "about": (ANONYMOUS, None, ""),
+    "student_dashboard": (STUDENT, None, ""),
+    "vendor_dashboard": (VENDOR, None, ""),
+    "create_order": (STUDENT, None, ""),
+    "student_orders": (STUDENT, None, ""),
+    "update_order": (VENDOR, lambda f: {"order_id": f["print_order"].pk}, ""),
+    "download_order_document": (VENDOR, lambda f: {"order_id": f["print_order"].pk}, ""),
+    "admin_approve_vendors": (ADMIN, None, ""),
+    "shop": (STUDENT, None, ""),
+    "shop_items": (STUDENT, None, ""),
+    "studentshop": (STUDENT, None, ""),
+    "search": (STUDENT, None, "q=calculus"),
+    "student_add_item": (STUDENT, None, ""),
+    "order_item": (STUDENT, lambda f: {"item_id": f["student_item"].pk}, ""),
+    "vendor_orders": (VENDOR, None, ""),
+    "bulk_update_order_status": "POST only",
+    "student_vendor_orders": (STUDENT, None, ""),
+    "bulk_update_student_order_status": "POST only",
+    "update_order_status": "POST only",
+    "update_student_order_status": "POST only",
+    "my_store": (VENDOR, None, ""),
+    "student_my_store": (STUDENT, None, ""),
+    "add_item": (VENDOR, None, ""),
+    "toggle_item_status": "changes the item",
+    "edit_item": (VENDOR, lambda f: {"item_id": f["shop_item"].pk}, ""),
+    "delete_item": (VENDOR, lambda f: {"item_id": f["shop_item"].pk}, ""),
+    "student_delete_item": (STUDENT, lambda f: {"item_id": f["own_student_item"].pk}, ""),
+    "approve_student_item": "POST only",
+    "moderation_queue": (VENDOR, None, ""),
+    "moderate_student_items": "POST only",
+    "delivery_details": (STUDENT, lambda f: {"order_id": f["student_order"].pk}, ""),
+    "create_checkout_session": "calls Stripe",
+    "payment_success": "needs a paid Stripe session",
+    "payment_cancel": (STUDENT, None, ""),
+    "stripe_webhook": "POST only",
+    "view_cart": (STUDENT, None, ""),
+    "add_to_cart": "changes the cart",
+    "remove_from_cart": "changes the cart",
+    "cart_checkout": (STUDENT, None, ""),
+    "create_cart_checkout_session": "calls Stripe",
+    "api_categories": (ANONYMOUS, None, ""),
+    "api_shop_items": (ANONYMOUS, None, "fields=id,name,price,images"),
+    "api_shop_item": (ANONYMOUS, lambda f: {"item_id": f["shop_item"].pk}, ""),
+    "api_student_items": (ANONYMOUS, None, ""),
+    "api_student_item": (ANONYMOUS, lambda f: {"item_id": f["student_item"].pk}, ""),
+}
+
+
+def route_names():
+    """Names of the routes in core/urls.py, in order and without repeats."""
+    names = []
+    for pattern in urls.urlpatterns:
+        if isinstance(pattern, URLPattern) and pattern.name and pattern.name not in names:
+            names.append(pattern.name)
+    return names
+
+
+def unconfigured_routes():
+    return [name for name in route_names() if name not in ROUTES]
+
+
+def make_fixtures(prefix="seed"):
+    """The users and objects benchmarked routes act on, taken from (or added to) the seeded data."""
+    student = CustomUser.objects.get(username=f"{prefix}_student_0")
+    vendor = CustomUser.objects.get(username=f"{prefix}_vendor_0")
+    admin, _ = CustomUser.objects.get_or_create(
+        username=f"{prefix}_admin", defaults={"is_superuser": True, "is_staff": True}
+    )
+    shop_item = ShopItem.objects.filter(vendor=vendor).first() or ShopItem.objects.create(
+        vendor=vendor, name="Bench item", price=100, image=PLACEHOLDER_IMAGE, status="active"
+    )
+    own_student_item = StudentListedShopItem.objects.filter(student_vendor=student).first() or \
+        StudentListedShopItem.objects.create(
+            student_vendor=student, name="Bench listing", price=50, image=PLACEHOLDER_IMAGE
+        )
+    student_item = StudentListedShopItem.objects.filter(status="active").first() or \
+        StudentListedShopItem.objects.create(
+            student_vendor=student, name="Bench listing", price=50, image=PLACEHOLDER_IMAGE, status="active"
+        )
+    student_order = StudentShopOrder.objects.filter(buyer=student).first() or \
+        StudentShopOrder.objects.create(buyer=student, item=student_item)
+    print_order = Order.objects.filter(vendor=vendor).first() or Order.objects.create(
+        student=student, vendor=vendor, document=PLACEHOLDER_DOCUMENT
+    )
+    return {
+        STUDENT: student, VENDOR: vendor, ADMIN: admin,
+        "shop_item": shop_item, "own_student_item": own_student_item, "student_item": student_item,
+        "student_order": student_order, "print_order": print_order,
+    }
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def bench_route(client, path, iterations, warmup):
+    """Times ``iterations`` GETs of ``path`` after ``warmup`` untimed ones."""
+    # The query log is a bounded deque; once full, captures would count nothing.
+    reset_queries()
+    with CaptureQueriesContext(connection) as cold:
+        response = client.get(path)
+    for _ in range(max(warmup - 1, 0)):
+        client.get(path)
+
+    timings, queries = [], []
+    for _ in range(iterations):
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(path)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+
+    return {
+        "path": path,
+        "status": response.status_code,
+        "queries_cold": len(cold),
+        "queries": max(queries),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        **{f"p{p}_ms": round(percentile(timings, p), 3) for p in (50, 90, 95, 99)},
+    }
+
+
+def run(fixtures, iterations=20, warmup=2, only=None):
+    """Benchmarks the routes (all, or those named in ``only``); returns ``(results, skipped)``."""
+    clients = {ANONYMOUS: Client()}
+    for role in (STUDENT, VENDOR, ADMIN):
+        clients[role] = Client()
+        clients[role].force_login(fixtures[role])
+
+    results, skipped = {}, {}
+    for name in route_names():
+        if only and name not in only:
+            continue
+        spec = ROUTES[name]
+        if isinstance(spec, str):
+            skipped[name] = spec
+            continue
+        role, kwargs, query = spec
+        path = reverse(name, kwargs=kwargs(fixtures) if kwargs else None)
+        if query:
+            path = f"{path}?{query}"
+        results[name] = {"role": role, **bench_route(clients[role], path, iterations, warmup)}
+    return results, skipped
+
+
+def compare(results, baseline, query_tolerance=0, latency_tolerance=None):
+    """Lists the regressions of ``results`` against a baseline run's routes."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for key in ("queries", "queries_cold"):
+            if result[key] > before[key] + query_tolerance:
+                regressions.append(f"{name}: {key} {before[key]} -> {result[key]}")
+        # Saved baselines carry no timings
+        if latency_tolerance is None or "p50_ms" not in before:
+            continue
+        if result["p50_ms"] > before["p50_ms"] * (1 + latency_tolerance):
+            regressions.append(f"{name}: p50 {before['p50_ms']}ms -> {result['p50_ms']}ms")
+    return regressions
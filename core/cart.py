@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+
+from .models import CartItem, ShopOrder
+
+
+def _cart_count_key(user_id):
+    return f"cart_count:{user_id}"
+
+
+def get_cart_count(user_id):
+    """Returns the number of items in a user's cart, counting them only on a cache miss."""
+    key = _cart_count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = CartItem.objects.filter(cart__user_id=user_id).aggregate(
+            total_quantity=Sum("quantity")
+        )["total_quantity"] or 0
+        cache.set(key, count, timeout=settings.CART_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def increment_cart_count(user_id, quantity=1):
+    """Adds ``quantity`` to a cached count, recounting if it is not cached. Returns the new count."""
+    try:
+        return cache.incr(_cart_count_key(user_id), quantity)
+    except ValueError:
+        return get_cart_count(user_id)
+
+
+def evict_cart_count(user_id):
+    cache.delete(_cart_count_key(user_id))
+
+
+def read_cart(user_id, *prefetch):
+    """
+    Returns ``(lines, total)`` for a user's cart. Lines, their items and the
+    totals come from one query; each ``prefetch`` lookup adds one more,
+    however many lines there are.
+    """
+    lines = list(
+        CartItem.objects.filter(cart__user_id=user_id).with_totals().prefetch_related(*prefetch)
+    )
+    total = lines[0].cart_total if lines else Decimal("0")
+    return lines, total
+
+
+def place_cart_orders(user_id, session_id, delivery_details):
+    """
+    Turns a user's paid cart into one ShopOrder per line and empties it, all
+    in one transaction. Keyed on the Stripe session: returns False without
+    changing anything if the session's orders were already placed.
+    """
+    try:
+        with transaction.atomic():
+            if ShopOrder.objects.filter(stripe_session_id=session_id).exists():
+                return False
+            lines = CartItem.objects.filter(cart__user_id=user_id)
+            orders = ShopOrder.objects.bulk_create([
+                ShopOrder(
+                    buyer_id=user_id,
+                    item_id=line.item_id,
+                    quantity=line.quantity,
+                    status="pending",
+                    payment_status="Paid",
+                    delivery_details=delivery_details,
+                    stripe_session_id=session_id,
+                )
+                for line in lines
+            ])
+            lines.delete()
+    except IntegrityError:
+        # A concurrent request for the same session got there first
+        return False
+    evict_cart_count(user_id)
+    return bool(orders)
+
+
+def format_delivery_details(name=None, phone=None, address=None):
+    """The delivery_details text stored on each ShopOrder of a cart checkout."""
+    return (
+        f"Name: {name or 'N/A'}\n"
+        f"Phone: {phone or 'N/A'}\n"
+        f"Address: {address or 'N/A'}"
+    )
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+CATALOG_VERSION_KEY = "catalog:version"
+
+
+def catalog_role(user):
+    """Returns the role the catalog pages are rendered for."""
+    if not user.is_authenticated:
+        return "anonymous"
+    if user.role == "vendor":
+        return "vendor"
+    return "student"
+
+
+def _fresh_version():
+    # Seeded from the clock so a version lost to eviction is never reused.
+    return time.time_ns() // 1000
+
+
+def get_catalog_version():
+    """Returns the current catalog version, starting a new one if it was evicted."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, _fresh_version(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidates every cached catalog listing by moving to a new version."""
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, _fresh_version(), timeout=None)
+        return cache.get(CATALOG_VERSION_KEY)
+
+
+def cached_catalog(page, role, build):
+    """
+    Returns the evaluated catalog for a page and role, building it with
+    ``build()`` on a miss. Entries are keyed on the catalog version, so a
+    bump makes all of them unreachable at once.
+    """
+    key = f"catalog:{page}:{role}"
+    version = get_catalog_version()
+    categories = cache.get(key, version=version)
+    if categories is None:
+        categories = build()
+        cache.set(key, categories, timeout=settings.CATALOG_CACHE_TIMEOUT, version=version)
+    return categories
@@ -0,0 +1,14 @@
+from django.utils.functional import SimpleLazyObject
+
+from .cart import get_cart_count
+
+
+def cart_count(request):
+    """
+    Exposes ``cart_count`` for the cart badge in base.html. It is lazy, so
+    pages that don't show the badge never touch the cache or the database.
+    """
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated or user.role != "student":
+        return {"cart_count": 0}
+    return {"cart_count": SimpleLazyObject(lambda: get_cart_count(user.pk))}
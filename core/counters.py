@@ -0,0 +1,110 @@
+from django.db.models import Count, F, Q
+
+from .models import CustomUser, Order, OrderCounter
+
+COUNTED_FIELDS = ("student_id", "vendor_id", "status")
+
+# Marker for an Order loaded with some counted fields deferred.
+UNKNOWN = object()
+
+
+def counted_state(order):
+    """The ``(student_id, vendor_id, status)`` an order currently contributes to the counters."""
+    values = order.__dict__
+    if any(field not in values for field in COUNTED_FIELDS):
+        return UNKNOWN
+    return tuple(values[field] for field in COUNTED_FIELDS)
+
+
+def _count_columns():
+    return {
+        "total": Count("id"),
+        "in_progress": Count("id", filter=Q(status="in_progress")),
+        "done": Count("id", filter=Q(status="done")),
+    }
+
+
+def aggregate_order_counts(user):
+    """Counts a user's print orders (as student or vendor) with one conditional aggregate."""
+    return Order.objects.filter(Q(student=user) | Q(vendor=user)).aggregate(**_count_columns())
+
+
+def get_order_counts(user):
+    """
+    Returns the user's OrderCounter. Users without a row yet are counted
+    with a single aggregate, which is then stored for the next lookup.
+    """
+    try:
+        return OrderCounter.objects.get(pk=user.pk)
+    except OrderCounter.DoesNotExist:
+        counter, _ = OrderCounter.objects.get_or_create(
+            user_id=user.pk,
+            defaults={**aggregate_order_counts(user), "assignable": user.can_take_orders()},
+        )
+        return counter
+
+
+def refresh_order_counters(user_ids):
+    """Recomputes the counters of the given users from the orders table."""
+    user_ids = list(user_ids)
+    counts = {user_id: {"total": 0, "in_progress": 0, "done": 0} for user_id in user_ids}
+    for field in ("student_id", "vendor_id"):
+        rows = (
+            Order.objects.filter(**{f"{field}__in": user_ids})
+            .values(field)
+            .annotate(**_count_columns())
+        )
+        for row in rows:
+            for column, value in counts[row[field]].items():
+                counts[row[field]][column] = value + row[column]
+
+    assignable = set(
+        CustomUser.objects.filter(
+            id__in=user_ids, role="vendor", is_approved=True, is_active=True
+        ).values_list("id", flat=True)
+    )
+    OrderCounter.objects.bulk_create(
+        [
+            OrderCounter(user_id=user_id, assignable=user_id in assignable, **values)
+            for user_id, values in counts.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["total", "in_progress", "done", "assignable"],
+    )
+
+
+def apply_order_change(old, new, create_missing=True):
+    """
+    Moves one order's contribution from the ``old`` to the ``new`` counted
+    state (either may be None) with an ``F()`` update per affected user.
+    Users with no counter row yet are recomputed when ``create_missing`` is set.
+    """
+    deltas = {}
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+        student_id, vendor_id, status = state
+        for user_id in {student_id, vendor_id} - {None}:
+            delta = deltas.setdefault(user_id, {"total": 0, "in_progress": 0, "done": 0})
+            delta["total"] += sign
+            if status in ("in_progress", "done"):
+                delta[status] += sign
+
+    missing = []
+    for user_id, delta in deltas.items():
+        changes = {column: F(column) + value for column, value in delta.items() if value}
+        if not changes:
+            continue
+        if not OrderCounter.objects.filter(user_id=user_id).update(**changes) and create_missing:
+            missing.append(user_id)
+
+    if missing:
+        refresh_order_counters(missing)
+
+
+def sync_assignable(user):
+    """Mirrors ``user.can_take_orders()`` onto the user's counter row."""
+    assignable = user.can_take_orders()
+    if not OrderCounter.objects.filter(user_id=user.pk).update(assignable=assignable) and assignable:
+        refresh_order_counters([user.pk])
@@ -0,0 +1,29 @@
+from django.db.models import F
+
+from .models import Order, StoredDocument
+from .storage import content_digest
+
+
+def document_name(value):
+    """The stored name held by a FileField value (a name, a FieldFile or None)."""
+    return getattr(value, "name", value) or None
+
+
+def retain_document(name):
+    """Records one more order using the content-addressed file ``name``."""
+    digest = content_digest(name)
+    if digest is None:
+        return
+    storage = Order._meta.get_field("document").storage
+    StoredDocument.objects.get_or_create(
+        sha256=digest, defaults={"name": name, "size": storage.size(name)}
+    )
+    StoredDocument.objects.filter(pk=digest).update(ref_count=F("ref_count") + 1)
+
+
+def release_document(name):
+    """Records one order fewer using ``name``; unreferenced files are removed by prune_documents."""
+    digest = content_digest(name)
+    if digest is None:
+        return
+    StoredDocument.objects.filter(pk=digest).update(ref_count=F("ref_count") - 1)
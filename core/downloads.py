@@ -0,0 +1,154 @@
+"""
+Sending stored files from views once the request has been authorised.
+
+With ``MEDIA_ACCEL`` set the front server transfers the bytes (nginx
+``X-Accel-Redirect`` to an internal location aliasing MEDIA_ROOT, or
+Apache/lighttpd ``X-Sendfile``) and handles Range itself. Otherwise the
+file is streamed with FileResponse, which WSGI servers hand to
+``os.sendfile``, and single byte ranges are answered 206.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+RANGE = re.compile(r"^bytes=(?P<start>\d*)-(?P<end>\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Returns the ``(start, end)`` byte offsets (inclusive) asked for by a
+    single-range ``Range`` header, or None to send the whole file (no
+    header, or one this doesn't handle, such as several ranges). Raises
+    RangeNotSatisfiable if the range lies outside the file.
+    """
+    match = RANGE.match(header.replace(" ", "")) if header else None
+    if match is None:
+        return None
+    start, end = match["start"], match["end"]
+    if not start:
+        if not end:
+            return None
+        # Suffix range: the last ``end`` bytes
+        if int(end) == 0:
+            raise RangeNotSatisfiable
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+class RangeFile:
+    """
+    ``length`` bytes of an open file from its current position. It keeps
+    ``fileno()``, so servers using ``os.sendfile`` still send it zero-copy,
+    bounded by the response's Content-Length.
+    """
+
+    def __init__(self, f, length):
+        self.file = f
+        self.remaining = length
+        self.name = f.name
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/"')):
+        # Only a strong validator may resume a download
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def serve_file(request, storage, name, filename=None, as_attachment=False, private=False):
+    """
+    Sends the stored file ``name`` with validators and Range support.
+    ``filename`` is what the browser should save it as. Private files may
+    only be kept by the requester's own cache.
+    """
+    try:
+        path = storage.path(name)
+        stat = os.stat(path)
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        raise Http404("No such file")
+    if not os.path.isfile(path):
+        raise Http404("No such file")
+
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = quote_etag(f"{size:x}-{stat.st_mtime_ns:x}")
+    filename = filename or os.path.basename(name)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _send(request, path, name, size, etag, last_modified, filename, as_attachment)
+    response.headers.setdefault("ETag", etag)
+    response.headers.setdefault("Last-Modified", http_date(last_modified))
+    if private:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_MAX_AGE)
+    return response
+
+
+def _send(request, path, name, size, etag, last_modified, filename, as_attachment):
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if settings.MEDIA_ACCEL:
+        response = HttpResponse(content_type=content_type)
+        if settings.MEDIA_ACCEL == "x-accel-redirect":
+            response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+        else:
+            response["X-Sendfile"] = path
+        if disposition := content_disposition_header(as_attachment, filename):
+            response["Content-Disposition"] = disposition
+        return response
+
+    byte_range = None
+    if request.method == "GET" and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    f = open(path, "rb")
+    if byte_range is None:
+        response = FileResponse(f, as_attachment=as_attachment, filename=filename, content_type=content_type)
+    else:
+        start, end = byte_range
+        f.seek(start)
+        response = FileResponse(
+            RangeFile(f, end - start + 1), as_attachment=as_attachment, filename=filename,
+            content_type=content_type, status=206,
+        )
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
@@ -0,0 +1,147 @@
+"""
+A stand-in for the parts of the Stripe API the checkout flow uses, for
+running tests and load tests offline. Serve it with
+``manage.py run_fake_stripe`` (or ``serve_in_thread()`` from a test) and
+point STRIPE_API_BASE at it. Given a webhook URL and secret, it also
+delivers a signed ``checkout.session.completed`` event for each paid session.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+from urllib.request import Request, urlopen
+
+SESSION_PATH = re.compile(r"^/v1/checkout/sessions/(?P<id>[\w-]+)$")
+LINE_ITEM_KEY = re.compile(r"^line_items\[(\d+)\]\[(?:price_data\]\[)?(unit_amount|quantity|currency)\]$")
+METADATA_KEY = re.compile(r"^metadata\[(.+)\]$")
+
+logger = logging.getLogger(__name__)
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, paid=True, webhook_url=None, webhook_secret=None):
+        super().__init__(address, FakeStripeHandler)
+        self.latency = latency
+        self.paid = paid
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def create_session(self, form):
+        """Builds a checkout.session from the form-encoded create parameters."""
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        lines, metadata = {}, {}
+        for key, value in form:
+            if match := LINE_ITEM_KEY.match(key):
+                lines.setdefault(match.group(1), {})[match.group(2)] = value
+            elif match := METADATA_KEY.match(key):
+                metadata[match.group(1)] = value
+        params = dict(form)
+        session = {
+            "id": session_id,
+            "object": "checkout.session",
+            "mode": params.get("mode", "payment"),
+            "status": "complete" if self.paid else "open",
+            "payment_status": "paid" if self.paid else "unpaid",
+            "amount_total": sum(
+                int(line.get("unit_amount", 0)) * int(line.get("quantity", 1)) for line in lines.values()
+            ),
+            "currency": next((line["currency"] for line in lines.values() if "currency" in line), "bdt"),
+            "client_reference_id": params.get("client_reference_id"),
+            "metadata": metadata,
+            "success_url": params.get("success_url", "").replace("{CHECKOUT_SESSION_ID}", session_id),
+            "cancel_url": params.get("cancel_url"),
+            "url": f"{self.base_url}/pay/{session_id}",
+            "created": int(time.time()),
+            "livemode": False,
+        }
+        with self.lock:
+            self.sessions[session_id] = session
+        if self.paid and self.webhook_url:
+            threading.Thread(target=self.send_event, args=("checkout.session.completed", session)).start()
+        return session
+
+    def send_event(self, event_type, obj):
+        """Posts a signed event to the webhook URL, the way Stripe does."""
+        payload = json.dumps({
+            "id": f"evt_test_{uuid.uuid4().hex}",
+            "object": "event",
+            "type": event_type,
+            "created": int(time.time()),
+            "livemode": False,
+            "data": {"object": obj},
+        })
+        timestamp = int(time.time())
+        signature = hmac.new(
+            self.webhook_secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+        ).hexdigest()
+        request = Request(self.webhook_url, data=payload.encode(), method="POST", headers={
+            "Content-Type": "application/json",
+            "Stripe-Signature": f"t={timestamp},v1={signature}",
+        })
+        try:
+            urlopen(request, timeout=10).close()
+        except OSError as e:
+            logger.warning("Webhook delivery to %s failed: %s", self.webhook_url, e)
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qsl(self.rfile.read(length).decode(), keep_blank_values=True)
+        if self.path == "/v1/checkout/sessions":
+            self.send_json(200, self.server.create_session(form))
+        else:
+            self.send_not_found()
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        match = SESSION_PATH.match(self.path.split("?")[0])
+        session = match and self.server.sessions.get(match.group("id"))
+        if session:
+            self.send_json(200, session)
+        else:
+            self.send_not_found()
+
+    def send_not_found(self):
+        self.send_json(404, {"error": {
+            "type": "invalid_request_error",
+            "code": "resource_missing",
+            "message": f"No such resource: {self.path}",
+        }})
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Request-Id", f"req_{uuid.uuid4().hex[:14]}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_in_thread(host="127.0.0.1", port=0, **options):
+    """Starts a FakeStripeServer on a daemon thread and returns it; call ``shutdown()`` when done."""
+    server = FakeStripeServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
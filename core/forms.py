@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from .models import *
 
@@ -61,6 +62,13 @@ class OrderForm(forms.ModelForm):
         self.fields['vendor'].queryset = CustomUser.objects.filter(role='vendor', is_approved=True)
         self.fields['vendor'].required = False  # optional, student can let system auto-assign
 
+    def clean_document(self):
+        document = self.cleaned_data['document']
+        limit = settings.MAX_DOCUMENT_UPLOAD_SIZE
+        if document and document.size > limit:
+            raise forms.ValidationError(f"Documents can be at most {limit // (1024 * 1024)} MB.")
+        return document
+
 
 
 class OrderUpdateForm(forms.ModelForm):
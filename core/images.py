@@ -0,0 +1,97 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .background import run_after_commit
+from .catalog import bump_catalog_version
+from .models import ImageDerivative
+
+# Pillow format name and save options for each derivative format.
+ENCODERS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def _has_derivatives(content_type, object_id, source):
+    return ImageDerivative.objects.filter(content_type=content_type, object_id=object_id, source=source).exists()
+
+
+def needs_derivatives(item):
+    """True if the item has an image with no derivatives made from it yet."""
+    if not item.image:
+        return False
+    return not _has_derivatives(ContentType.objects.get_for_model(item), item.pk, item.image.name)
+
+
+def schedule_derivatives(item):
+    """Builds the item's derivatives on a worker thread once the upload is committed."""
+    content_type = ContentType.objects.get_for_model(item)
+    run_after_commit(
+        build_derivatives, content_type.pk, item.pk, item.image.name,
+        async_setting="IMAGE_DERIVATIVES_ASYNC", pool="image-derivatives",
+        workers=settings.IMAGE_DERIVATIVE_WORKERS,
+    )
+
+
+def _target_widths(original_width):
+    widths = [width for width in settings.IMAGE_DERIVATIVE_WIDTHS if width < original_width]
+    return widths or [original_width]
+
+
+def build_derivatives(content_type_id, object_id, source):
+    """
+    Writes a WebP and a JPEG copy of ``source`` at each configured width
+    (never upscaling) and records them, replacing derivatives of any older
+    image of the same item. Does nothing if the item's image has since
+    changed or another build of it got there first (every save before the
+    first build commits schedules one).
+    """
+    content_type = ContentType.objects.get_for_id(content_type_id)
+    item = content_type.get_object_for_this_type(pk=object_id)
+    if item.image.name != source or _has_derivatives(content_type, object_id, source):
+        return
+
+    with item.image.open("rb") as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original = original.convert("RGB")
+
+    stem = os.path.splitext(os.path.basename(source))[0]
+    derivatives = []
+    for width in _target_widths(original.width):
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt, (pil_format, options) in ENCODERS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            derivative = ImageDerivative(
+                content_type=content_type, object_id=object_id, source=source, width=width, format=fmt
+            )
+            derivative.image.save(f"{stem}-{width}w.{fmt}", ContentFile(buffer.getvalue()), save=False)
+            derivatives.append(derivative)
+
+    with transaction.atomic():
+        built = not _has_derivatives(content_type, object_id, source)
+        if built:
+            # Each deleted row's file goes once this commits (delete_derivative_file)
+            ImageDerivative.objects.filter(content_type=content_type, object_id=object_id).delete()
+            ImageDerivative.objects.bulk_create(derivatives)
+    if not built:
+        for derivative in derivatives:
+            default_storage.delete(derivative.image.name)
+        return
+
+    # Cached catalog pages were rendered without these srcsets.
+    bump_catalog_version()
+
+
+def delete_derivative_file(derivative):
+    """Deletes a derivative's file once the deletion of its row is committed."""
+    if derivative.image:
+        transaction.on_commit(lambda name=derivative.image.name: default_storage.delete(name))
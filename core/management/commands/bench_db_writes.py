@@ -0,0 +1,152 @@
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.bench import percentile
+from core.models import Cart, CartItem, CustomUser, ShopItem
+
+
+def add_to_cart(student_id, item_id):
+    """The writes of the add_to_cart view, in one transaction."""
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user_id=student_id)
+        cart_item, created = CartItem.objects.get_or_create(cart=cart, item_id=item_id)
+        if not created:
+            CartItem.objects.filter(pk=cart_item.pk).update(quantity=F("quantity") + 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures concurrent write throughput (add_to_cart transactions from several threads) "
+        "against a throwaway copy of the configured database. On SQLite it runs the stock "
+        "settings and then the tuned profile from settings.DATABASES, for comparison."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent writers.")
+        parser.add_argument("--ops", type=int, default=200, help="Transactions per writer.")
+        parser.add_argument("--items", type=int, default=50, help="Shop items the writers pick from.")
+        parser.add_argument(
+            "--profile", choices=["default", "tuned"],
+            help="SQLite only: run just the stock (default) or the configured (tuned) settings.",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the item choices.")
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1 or options["ops"] < 1:
+            raise CommandError("--threads and --ops must be at least 1.")
+        db_settings = connections.settings[connection.alias]
+        vendor = connection.vendor
+        if vendor == "sqlite":
+            profiles = {
+                "default": {},
+                "tuned": db_settings["OPTIONS"],
+            }
+            if options["profile"]:
+                profiles = {options["profile"]: profiles[options["profile"]]}
+        else:
+            if options["profile"]:
+                raise CommandError("--profile only applies to SQLite.")
+            profiles = {"configured": db_settings["OPTIONS"]}
+
+        setup_test_environment()
+        old_name, old_options, old_test_name = db_settings["NAME"], db_settings["OPTIONS"], db_settings["TEST"]["NAME"]
+        fd, sqlite_file = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        try:
+            if vendor == "sqlite":
+                # Threads need a shared file, not the in-memory test database
+                db_settings["TEST"]["NAME"] = sqlite_file
+                # Build it with the stock settings so it starts in rollback-journal mode
+                db_settings["OPTIONS"] = profiles.get("default", {})
+            connection.close()
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                student_ids, item_ids = self.make_data(options["threads"], options["items"])
+                results = {}
+                for name, profile_options in profiles.items():
+                    db_settings["OPTIONS"] = profile_options
+                    connection.close()
+                    results[f"{vendor}-{name}"] = self.run(student_ids, item_ids, options)
+            finally:
+                db_settings["OPTIONS"] = old_options
+                connection.close()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            db_settings["OPTIONS"], db_settings["TEST"]["NAME"] = old_options, old_test_name
+            teardown_test_environment()
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                if os.path.exists(sqlite_file + suffix):
+                    os.unlink(sqlite_file + suffix)
+
+        self.stdout.write(json.dumps({
+            "threads": options["threads"],
+            "ops_per_thread": options["ops"],
+            "results": results,
+        }, indent=2))
+
+    def make_data(self, students, items):
+        vendor = CustomUser.objects.create(username="bench_writes_vendor", role="vendor", is_approved=True)
+        shop_items = ShopItem.objects.bulk_create([
+            ShopItem(vendor=vendor, name=f"Bench item {i}", price=100, status="active") for i in range(items)
+        ])
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f"bench_writes_student_{i}", role="student", password="!") for i in range(students)
+        ])
+        return [user.pk for user in users], [item.pk for item in shop_items]
+
+    def run(self, student_ids, item_ids, options):
+        # Start every profile from empty carts
+        Cart.objects.all().delete()
+        connection.close()
+
+        latencies, errors = [], []
+        lock = threading.Lock()
+        start_line = threading.Barrier(len(student_ids))
+
+        def writer(student_id, rng):
+            mine, failed = [], []
+            try:
+                start_line.wait()
+                for _ in range(options["ops"]):
+                    started = time.perf_counter()
+                    try:
+                        add_to_cart(student_id, rng.choice(item_ids))
+                    except OperationalError as e:
+                        failed.append(str(e))
+                    else:
+                        mine.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(mine)
+                    errors.extend(failed)
+
+        threads = [
+            threading.Thread(target=writer, args=(student_id, random.Random(options["seed"] + i)))
+            for i, student_id in enumerate(student_ids)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            "committed": len(latencies),
+            "errors": len(errors),
+            "error_kinds": sorted(set(errors)),
+            "tx_per_second": round(len(latencies) / elapsed, 1),
+            **({
+                f"p{p}_ms": round(percentile(latencies, p), 3) for p in (50, 95, 99)
+            } if latencies else {}),
+        }
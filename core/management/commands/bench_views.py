@@ -0,0 +1,124 @@
+import json
+import random
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from core.bench import compare, make_fixtures, run, unconfigured_routes
+from core.seeding import DEFAULT_VOLUMES, seed
+
+BENCH_SETTINGS = {
+    # Keep the run self-contained: a private cache and no background threads
+    "CACHES": {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench"}},
+    "IMAGE_DERIVATIVES_ASYNC": False,
+    "PREFLIGHT_ASYNC": False,
+    "STRIPE_EVENTS_ASYNC": False,
+}
+
+# What a saved baseline keeps of each route's result
+BASELINE_KEYS = ("role", "path", "status", "queries_cold", "queries")
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway test database and benchmarks every route in core/urls.py, reporting "
+        "latency percentiles and SQL query counts as JSON. With --baseline, exits non-zero when "
+        "query counts regress (e.g. in CI: bench_views --baseline benchmarks/views.json). "
+        "--save-baseline writes such a baseline: query counts only, as latency depends on the machine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20, help="Timed requests per route.")
+        parser.add_argument("--warmup", type=int, default=2, help="Untimed requests per route first.")
+        parser.add_argument("--scale", type=float, default=1.0, help="Multiply the seed_data default volumes.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated data.")
+        parser.add_argument("--route", action="append", dest="routes", help="Only benchmark this route (repeatable).")
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+        parser.add_argument("--baseline", help="JSON report of an earlier run to compare against.")
+        parser.add_argument("--save-baseline", help="Also write the query counts here, as a baseline to commit.")
+        parser.add_argument(
+            "--query-tolerance", type=int, default=0,
+            help="Extra queries per route allowed over the baseline.",
+        )
+        parser.add_argument(
+            "--latency-tolerance", type=float,
+            help="Also fail when a route's p50 exceeds the baseline's by this fraction (e.g. 0.5). "
+                 "Needs an --output report from the same machine as the baseline.",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        unconfigured = unconfigured_routes()
+        if unconfigured:
+            raise CommandError(f"Add these routes to core.bench.ROUTES: {', '.join(unconfigured)}")
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"]) as f:
+                    baseline = json.load(f)["routes"]
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {e}")
+
+        volumes = {name: max(1, round(count * options["scale"])) for name, count in DEFAULT_VOLUMES.items()}
+        results, skipped = self.bench(volumes, options)
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "iterations": options["iterations"],
+            "volumes": volumes,
+            "routes": results,
+            "skipped": skipped,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+            for name, result in results.items():
+                self.stdout.write(
+                    f"{name:<28} {result['status']} {result['queries']:>3}q "
+                    f"p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms"
+                )
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as f:
+                json.dump({
+                    "volumes": volumes,
+                    "routes": {
+                        name: {key: result[key] for key in BASELINE_KEYS} for name, result in results.items()
+                    },
+                    "skipped": skipped,
+                }, f, indent=2)
+                f.write("\n")
+
+        if baseline is not None:
+            regressions = compare(
+                results, baseline, options["query_tolerance"], options["latency_tolerance"]
+            )
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+            self.stderr.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def bench(self, volumes, options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        media_root = tempfile.mkdtemp(prefix="bench-media-")
+        try:
+            with override_settings(MEDIA_ROOT=media_root, **BENCH_SETTINGS):
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                try:
+                    seed(volumes, rng=random.Random(options["seed"]))
+                    return run(
+                        make_fixtures(), options["iterations"], options["warmup"], options["routes"]
+                    )
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
@@ -0,0 +1,19 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+
+from core.images import build_derivatives, needs_derivatives
+from core.models import ShopItem, StudentListedShopItem
+
+
+class Command(BaseCommand):
+    help = "Builds missing WebP/JPEG derivatives for every listing image."
+
+    def handle(self, *args, **options):
+        built = 0
+        for model in (ShopItem, StudentListedShopItem):
+            content_type = ContentType.objects.get_for_model(model)
+            for item in model.objects.exclude(image="").exclude(image__isnull=True).iterator():
+                if needs_derivatives(item):
+                    build_derivatives(content_type.pk, item.pk, item.image.name)
+                    built += 1
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {built} images."))
@@ -0,0 +1,71 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.assignment import assignable_counters
+from core.models import CustomUser, Order, OrderCounter, ShopItem, ShopOrder, StudentListedShopItem
+from core.moderation import pending_items
+from core.orders import vendor_orders_queryset, vendor_print_queue
+from core.pagination import keyset_order
+
+# "SCAN core_shopitem" is a full table scan; "SCAN ... USING INDEX" is not.
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(?!.*\bUSING\b)")
+
+
+def view_queries():
+    """
+    The main query of each hot view, with placeholder ids, built with the
+    same helpers as the views wherever they have one.
+    """
+    user_id = category_id = 1
+    user = CustomUser(pk=user_id, role="vendor", is_approved=True)
+    return [
+        ("shop", ShopItem.objects.filter(status="active", category_id__in=[category_id])),
+        ("shop_items", keyset_order(ShopItem.objects.filter(status="active"))),
+        ("shop_items?category", keyset_order(ShopItem.objects.filter(status="active", category_id=category_id))),
+        ("studentshop", StudentListedShopItem.objects.filter(status="active", category_id__in=[category_id])),
+        ("my_store", ShopItem.objects.filter(vendor=user)),
+        ("student_my_store", StudentListedShopItem.objects.filter(student_vendor=user)),
+        ("student_orders", ShopOrder.objects.filter(buyer=user).select_related("item")),
+        ("student_orders (print)", Order.objects.filter(student=user)),
+        ("vendor_orders", keyset_order(vendor_print_queue(user).select_related("student"))),
+        ("vendor_orders?status", keyset_order(vendor_print_queue(user).filter(status="in_progress"))),
+        ("vendor_orders (shop)", keyset_order(
+            vendor_orders_queryset(user, "shop").select_related("item", "buyer")
+        )),
+        ("student_vendor_orders", vendor_orders_queryset(user, "student").select_related("item", "buyer")),
+        # get_order_counts() reads the counter row by primary key
+        ("vendor_dashboard", OrderCounter.objects.filter(pk=user_id)),
+        ("vendor_dashboard (recent)", user.vendor_orders.select_related("student").order_by("-created_at")[:5]),
+        ("moderation_queue", keyset_order(
+            pending_items().select_related("student_vendor", "category", "claimed_by")
+        )),
+        ("create_order (assignment)", assignable_counters()[:1]),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN QUERY PLAN on each hot view's main query and fails on full table scans."
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("check_query_plans only understands SQLite query plans.")
+
+        failures = []
+        for name, queryset in view_queries():
+            sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plan = [row[-1] for row in cursor.fetchall()]
+
+            scans = [step for step in plan if FULL_SCAN.match(step)]
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: {'; '.join(scans)}"))
+            else:
+                self.stdout.write(f"{name}: {'; '.join(plan)}")
+
+        if failures:
+            raise CommandError(f"Full table scan in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("No full table scans."))
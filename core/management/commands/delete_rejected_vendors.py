@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.vendors import delete_rejected_vendors
+
+
+class Command(BaseCommand):
+    help = "Deletes rejected vendor accounts whose background deletion did not run (e.g. after a restart)."
+
+    def handle(self, *args, **options):
+        deleted = delete_rejected_vendors()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} rejected vendors."))
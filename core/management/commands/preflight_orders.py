@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Order
+from core.preflight import preflight_order
+
+
+class Command(BaseCommand):
+    help = "Preflights print orders whose document has not been analysed yet (or failed)."
+
+    def handle(self, *args, **options):
+        orders = Order.objects.filter(preflight_status__in=["pending", "failed"]).exclude(document="")
+        count = 0
+        for order_id, document in orders.values_list("id", "document").iterator():
+            try:
+                preflight_order(order_id, document)
+            except Exception as e:
+                self.stderr.write(f"Order {order_id}: {e}")
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Preflighted {count} orders."))
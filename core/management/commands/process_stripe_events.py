@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core.models import StripeEvent
+from core.webhooks import process_event
+
+
+class Command(BaseCommand):
+    help = "Processes Stripe webhook events that have not been fulfilled yet (e.g. after a crash or failure)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-attempts", type=int, default=5,
+            help="Skip events that have already failed this many times.",
+        )
+
+    def handle(self, *args, **options):
+        events = StripeEvent.objects.filter(
+            processed_at__isnull=True, attempts__lt=options["max_attempts"]
+        ).order_by("received_at")
+        processed = failed = 0
+        for event_pk, event_id in events.values_list("pk", "event_id").iterator():
+            try:
+                process_event(event_pk)
+            except Exception as e:
+                self.stderr.write(f"Event {event_id}: {e}")
+                failed += 1
+            else:
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} events, {failed} failed."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Order, StoredDocument
+
+
+class Command(BaseCommand):
+    help = "Deletes stored print documents that no order references any more."
+
+    def handle(self, *args, **options):
+        storage = Order._meta.get_field("document").storage
+        pruned = 0
+        for document in StoredDocument.objects.filter(ref_count__lte=0).iterator():
+            with transaction.atomic():
+                # Skip documents re-uploaded since the query above
+                deleted, _ = StoredDocument.objects.filter(pk=document.pk, ref_count__lte=0).delete()
+                if deleted:
+                    transaction.on_commit(lambda name=document.name: storage.delete(name))
+                    pruned += 1
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} unreferenced documents."))
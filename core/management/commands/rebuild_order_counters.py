@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.counters import refresh_order_counters
+
+
+class Command(BaseCommand):
+    help = "Recomputes every user's dashboard order counters from the orders table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        user_ids = list(get_user_model().objects.values_list("id", flat=True).order_by("id"))
+        batch_size = options["batch_size"]
+        for start in range(0, len(user_ids), batch_size):
+            refresh_order_counters(user_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt order counters for {len(user_ids)} users."))
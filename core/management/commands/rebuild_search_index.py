@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.search import rebuild_index, search_supported
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index of shop and student listings."
+
+    def handle(self, *args, **options):
+        if not search_supported():
+            raise CommandError("The listing search index needs SQLite with FTS5.")
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Rebuilt the listing search index."))
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.fake_stripe import FakeStripeServer
+
+
+class Command(BaseCommand):
+    help = "Serves a local stand-in for the Stripe checkout API; point STRIPE_API_BASE at it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("addrport", nargs="?", default="127.0.0.1:12111")
+        parser.add_argument(
+            "--latency", type=float, default=0.0,
+            help="Seconds to wait before answering each request, to mimic the real API.",
+        )
+        parser.add_argument(
+            "--unpaid", action="store_true",
+            help="Report new checkout sessions as unpaid instead of paid.",
+        )
+        parser.add_argument(
+            "--webhook-url",
+            help="Deliver a signed checkout.session.completed event here for each paid session.",
+        )
+        parser.add_argument(
+            "--webhook-secret", default=settings.STRIPE_WEBHOOK_SECRET,
+            help="Secret to sign webhook events with (default: STRIPE_WEBHOOK_SECRET).",
+        )
+
+    def handle(self, *args, **options):
+        if options["webhook_url"] and not options["webhook_secret"]:
+            raise CommandError("--webhook-url needs --webhook-secret or STRIPE_WEBHOOK_SECRET.")
+        host, _, port = options["addrport"].rpartition(":")
+        try:
+            server = FakeStripeServer(
+                (host or "127.0.0.1", int(port)),
+                latency=options["latency"],
+                paid=not options["unpaid"],
+                webhook_url=options["webhook_url"],
+                webhook_secret=options["webhook_secret"],
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot serve on {options['addrport']}: {e}")
+
+        self.stdout.write(f"Fake Stripe API on {server.base_url} (STRIPE_API_BASE={server.base_url})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,40 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seeding import DEFAULT_VOLUMES, SEED_PASSWORD, seed, unseed
+
+
+class Command(BaseCommand):
+    help = "Fills the database with synthetic users, listings, carts and orders for development and benchmarks."
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default, dest=name)
+        parser.add_argument("--days", type=int, default=180, help="Spread created_at over this many days.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for repeatable data.")
+        parser.add_argument("--prefix", default="seed", help="Prefix of seeded usernames and category names.")
+        parser.add_argument(
+            "--flush", action="store_true", help="Delete data seeded earlier with the same prefix first."
+        )
+
+    def handle(self, *args, **options):
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        if min(volumes["students"], volumes["vendors"], volumes["categories"]) < 1:
+            raise CommandError("Seeding needs at least one student, vendor and category.")
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1.")
+
+        if options["flush"]:
+            unseed(options["prefix"])
+        try:
+            counts = seed(volumes, prefix=options["prefix"], rng=random.Random(options["seed"]), days=options["days"])
+        except Exception as e:
+            raise CommandError(f"Seeding failed ({e}); use --flush or another --prefix to reseed.")
+
+        for name, count in counts.items():
+            self.stdout.write(f"{name}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded data; log in as {options['prefix']}_student_0 or {options['prefix']}_vendor_0 "
+            f"with password '{SEED_PASSWORD}'."
+        ))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_alter_studentshoporder_item'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['vendor', 'status', 'created_at'], name='order_vendor_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopitem',
+            index=models.Index(fields=['status', 'category', 'created_at'], name='shopitem_status_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopitem',
+            index=models.Index(fields=['status', 'created_at'], name='shopitem_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoporder',
+            index=models.Index(fields=['buyer', 'created_at'], name='shoporder_buyer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentlistedshopitem',
+            index=models.Index(fields=['status', 'category'], name='studentitem_status_cat_idx'),
+        ),
+    ]
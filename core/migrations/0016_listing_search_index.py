@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:52
+
+from django.db import migrations
+
+
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_listing_fts USING fts5("
+    "name, description, status UNINDEXED, "
+    "tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')"
+)
+POPULATE_SQL = [
+    "INSERT INTO core_listing_fts (rowid, name, description, status) "
+    "SELECT id * 2, name, COALESCE(description, ''), status FROM core_shopitem",
+    "INSERT INTO core_listing_fts (rowid, name, description, status) "
+    "SELECT id * 2 + 1, name, COALESCE(description, ''), status FROM core_studentlistedshopitem",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; other backends simply have no search index.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    for sql in POPULATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS core_listing_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_ordercounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_content_addressed_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='color_pages',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='preflight_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed'), ('unsupported', 'Unsupported')], default='pending', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='preview',
+            field=models.ImageField(blank=True, null=True, upload_to='order_previews/'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='quote',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+def mark_assignable_vendors(apps, schema_editor):
+    OrderCounter = apps.get_model('core', 'OrderCounter')
+    OrderCounter.objects.filter(
+        user__role='vendor', user__is_approved=True, user__is_active=True
+    ).update(assignable=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_order_preflight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='assignment_weight',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='ordercounter',
+            name='assignable',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='ordercounter',
+            index=models.Index(django.db.models.expressions.CombinedExpression(models.F('total'), '-', models.F('done')), models.F('user'), condition=models.Q(('assignable', True)), name='ordercounter_outstanding_idx'),
+        ),
+        migrations.RunPython(mark_assignable_vendors, migrations.RunPython.noop),
+    ]
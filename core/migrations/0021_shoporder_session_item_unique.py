@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:47
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def drop_replayed_orders(apps, schema_editor):
+    # Reloads of the success page used to place a session's orders again;
+    # keep the first order for each session and item.
+    ShopOrder = apps.get_model('core', 'ShopOrder')
+    first_ids = (
+        ShopOrder.objects.filter(stripe_session_id__gt='')
+        .values('stripe_session_id', 'item')
+        .annotate(first_id=Min('id'))
+        .values('first_id')
+    )
+    ShopOrder.objects.filter(stripe_session_id__gt='').exclude(id__in=first_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_vendor_assignment'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_replayed_orders, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoporder',
+            constraint=models.UniqueConstraint(condition=models.Q(('stripe_session_id__gt', '')), fields=('stripe_session_id', 'item'), name='shoporder_session_item_uniq'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_stripeevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentlistedshopitem',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentlistedshopitem',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_student_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='studentlistedshopitem',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('inactive', 'Inactive'), ('rejected', 'Rejected')], default='inactive', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='studentlistedshopitem',
+            index=models.Index(fields=['status', 'created_at'], name='studentitem_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def backfill_vendor_counters(apps, schema_editor):
+    # 0020 only flagged vendors that already had a counter row; vendors
+    # without one were invisible to least_outstanding.
+    CustomUser = apps.get_model('core', 'CustomUser')
+    Order = apps.get_model('core', 'Order')
+    OrderCounter = apps.get_model('core', 'OrderCounter')
+    vendor_ids = CustomUser.objects.filter(
+        role='vendor', is_approved=True, is_active=True, order_counter__isnull=True
+    ).values_list('id', flat=True)
+    counters = []
+    for vendor_id in vendor_ids:
+        counts = Order.objects.filter(Q(student_id=vendor_id) | Q(vendor_id=vendor_id)).aggregate(
+            total=Count('id'),
+            in_progress=Count('id', filter=Q(status='in_progress')),
+            done=Count('id', filter=Q(status='done')),
+        )
+        counters.append(OrderCounter(user_id=vendor_id, assignable=True, **counts))
+    OrderCounter.objects.bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_studentlistedshopitem_moderation'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_vendor_counters, migrations.RunPython.noop),
+    ]
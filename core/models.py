@@ -1,8 +1,13 @@
 
-import random
+from decimal import Decimal
+
 from django.contrib.auth.models import AbstractUser
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
+from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.db.models import F, Q, Sum, Window
 from django.conf import settings
+from .storage import document_storage
 
 
 
@@ -13,11 +18,16 @@ class CustomUser(AbstractUser):
     )
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='student')
     is_approved = models.BooleanField(default=False)  # Only matters for vendors
+    assignment_weight = models.PositiveSmallIntegerField(default=1)  # Share of auto-assigned print orders
+    rejected_at = models.DateTimeField(null=True, blank=True)  # Set when an admin rejects the vendor sign-up
 
     def can_login(self):
         if self.role == 'vendor':
             return self.is_approved
         return True
+
+    def can_take_orders(self):
+        return self.role == 'vendor' and self.is_approved and self.is_active
     
 
 class Category(models.Model):
@@ -46,18 +56,41 @@ class Order(models.Model):
         limit_choices_to={'role': 'vendor', 'is_approved': True},
         related_name='vendor_orders'
     )
-    document = models.FileField(upload_to='orders/')
+    document = models.FileField(upload_to='orders/', storage=document_storage)
+    document_name = models.CharField(max_length=255, blank=True)  # name the file was uploaded as
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     scheduled_time = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    def assign_random_vendor(self):
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        vendors = User.objects.filter(role='vendor', is_approved=True)
-        if vendors.exists():
-            self.vendor = random.choice(vendors)
-            self.save()
+    # Filled in by the background preflight of the document (core.preflight)
+    PREFLIGHT_CHOICES = (
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ('unsupported', 'Unsupported'),
+    )
+    preflight_status = models.CharField(max_length=12, choices=PREFLIGHT_CHOICES, default='pending')
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    color_pages = models.JSONField(default=list, blank=True)  # 1-based numbers of pages printed in colour
+    preview = models.ImageField(upload_to='order_previews/', blank=True, null=True)
+    quote = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vendor', 'status', 'created_at'], name='order_vendor_status_idx'),
+        ]
+
+    def assign_vendor(self):
+        """Assigns a vendor chosen by the configured strategy (see core.assignment)."""
+        from .assignment import choose_vendor
+        vendor_id = choose_vendor(self)
+        if vendor_id is not None:
+            self.vendor_id = vendor_id
+            self.save(update_fields=['vendor'])
+
+    @property
+    def color_page_count(self):
+        return len(self.color_pages)
 
 class ShopItem(models.Model):
     STATUS_CHOICES = [
@@ -73,6 +106,13 @@ class ShopItem(models.Model):
     image = models.ImageField(upload_to="shop_items/", blank=True, null=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='inactive')
     created_at = models.DateTimeField(auto_now_add=True)
+    derivatives = GenericRelation("ImageDerivative")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'category', 'created_at'], name='shopitem_status_cat_idx'),
+            models.Index(fields=['status', 'created_at'], name='shopitem_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.category})"
@@ -82,6 +122,7 @@ class StudentListedShopItem(models.Model):
     STATUS_CHOICES = [
         ('active', 'Active'),
         ('inactive', 'Inactive'),
+        ('rejected', 'Rejected'),
     ]
 
     student_vendor = models.ForeignKey(
@@ -96,6 +137,15 @@ class StudentListedShopItem(models.Model):
         blank=True,
         related_name="approved_student_items"
     )
+    # Vendor currently reviewing the listing, so others skip it in the moderation queue
+    claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="claimed_student_items"
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="student_items")
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
@@ -103,6 +153,13 @@ class StudentListedShopItem(models.Model):
     image = models.ImageField(upload_to="student_shop_items/", blank=True, null=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='inactive')
     created_at = models.DateTimeField(auto_now_add=True)
+    derivatives = GenericRelation("ImageDerivative")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'category'], name='studentitem_status_cat_idx'),
+            models.Index(fields=['status', 'created_at'], name='studentitem_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.category})"
@@ -125,6 +182,18 @@ class ShopOrder(models.Model):
     payment_status = models.CharField(max_length=20, default="unpaid")
     stripe_session_id = models.CharField(max_length=255, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['buyer', 'created_at'], name='shoporder_buyer_created_idx'),
+        ]
+        constraints = [
+            # A Stripe session pays for each cart line once, however often its success URL is hit
+            models.UniqueConstraint(
+                fields=['stripe_session_id', 'item'],
+                condition=Q(stripe_session_id__gt=''),
+                name='shoporder_session_item_uniq',
+            ),
+        ]
 
     def total_price(self):
         return self.quantity * self.item.price
@@ -170,21 +239,126 @@ class Cart(models.Model):
     @property
     def total_price(self):
         """Calculates the total price of all items in the cart."""
-        return sum(item.total_price for item in self.items.all())
+        return self.items.aggregate(total=Sum(CartItem.LINE_TOTAL))['total'] or Decimal('0')
 
     def __str__(self):
         return f"Cart for {self.user.username}"
 
+class CartItemQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Lines with their items, annotated with ``line_total`` and, through a
+        window over the whole result, the ``cart_total`` of every line.
+        """
+        return self.select_related('item').annotate(
+            line_total=CartItem.LINE_TOTAL,
+            cart_total=Window(Sum(CartItem.LINE_TOTAL)),
+        ).order_by('id')
+
+
 class CartItem(models.Model):
     """An item within a cart."""
+    LINE_TOTAL = models.ExpressionWrapper(
+        F('item__price') * F('quantity'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     item = models.ForeignKey(ShopItem, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    objects = CartItemQuerySet.as_manager()
+
     @property
     def total_price(self):
         """Calculates the total price for this cart item."""
+        if hasattr(self, 'line_total'):
+            return self.line_total
         return self.item.price * self.quantity
 
     def __str__(self):
-        return f"{self.quantity} x {self.item.name} in {self.cart.user.username}'s cart"
\ No newline at end of file
+        return f"{self.quantity} x {self.item.name} in {self.cart.user.username}'s cart"
+
+class OrderCounter(models.Model):
+    """Print order counts shown on a user's dashboard, kept up to date by Order signals."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='order_counter'
+    )
+    total = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    done = models.IntegerField(default=0)
+    assignable = models.BooleanField(default=False)  # user.can_take_orders(), for vendor assignment
+
+    class Meta:
+        indexes = [
+            # Least outstanding (pending + in progress) assignable vendor first
+            models.Index(
+                F('total') - F('done'), F('user'),
+                name='ordercounter_outstanding_idx', condition=Q(assignable=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Order counts for user {self.user_id}"
+
+
+class ImageDerivative(models.Model):
+    """A resized copy of a listing image, generated in the background after upload."""
+    FORMAT_CHOICES = (
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    )
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    item = GenericForeignKey('content_type', 'object_id')
+    source = models.CharField(max_length=255)  # image name the derivative was made from
+    width = models.PositiveIntegerField()
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES)
+    image = models.ImageField(upload_to="derivatives/")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'], name='derivative_item_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} @ {self.width}w ({self.format})"
+
+
+class StoredDocument(models.Model):
+    """One stored copy of a print document, shared by every order uploading the same bytes."""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} orders)"
+
+
+class StripeEvent(models.Model):
+    """A verified Stripe webhook event, stored once and fulfilled in the background."""
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['received_at'], name='stripeevent_unprocessed_idx',
+                condition=Q(processed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
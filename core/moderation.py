@@ -0,0 +1,82 @@
+"""Vendor moderation of student-listed items."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import StudentListedShopItem
+from .search import index_item
+
+# Moderation action -> (status the listing ends up in, per-item result)
+DECISIONS = {"approve": ("active", "approved"), "reject": ("rejected", "rejected")}
+
+
+def pending_items():
+    """Listings still waiting for a vendor's decision."""
+    return StudentListedShopItem.objects.filter(status="inactive")
+
+
+def _open_to(vendor, now):
+    # Unclaimed, claimed by this vendor, or a claim that has expired
+    expired = now - timedelta(minutes=settings.MODERATION_CLAIM_MINUTES)
+    return Q(claimed_by__isnull=True) | Q(claimed_by=vendor) | Q(claimed_at__lt=expired)
+
+
+def claim_items(vendor, item_ids):
+    """
+    Claims the pending listings in ``item_ids`` for ``vendor`` so other
+    vendors skip them for ``MODERATION_CLAIM_MINUTES``. Listings another
+    vendor holds a live claim on are left alone. Returns how many were claimed.
+    """
+    now = timezone.now()
+    return pending_items().filter(_open_to(vendor, now), id__in=item_ids).update(
+        claimed_by=vendor, claimed_at=now
+    )
+
+
+def release_items(vendor, item_ids):
+    """Drops the vendor's claims on ``item_ids``."""
+    return StudentListedShopItem.objects.filter(claimed_by=vendor, id__in=item_ids).update(
+        claimed_by=None, claimed_at=None
+    )
+
+
+def moderate_items(vendor, item_ids, action):
+    """
+    Approves or rejects the pending listings in ``item_ids`` with one
+    conditional UPDATE. Returns ``{item_id: result}`` where result is
+    "approved"/"rejected", "not_pending" (missing or already decided) or
+    "claimed" (another vendor is reviewing it).
+    """
+    status, result = DECISIONS[action]
+    now = timezone.now()
+    with transaction.atomic():
+        pending = set(pending_items().select_for_update().filter(id__in=item_ids).values_list("id", flat=True))
+        updated = pending_items().filter(_open_to(vendor, now), id__in=pending).update(
+            status=status,
+            approved_by=vendor if status == "active" else None,
+            claimed_by=None,
+            claimed_at=None,
+        )
+        decided = []
+        if updated:
+            # The UPDATE only matched open listings; read back which ones it took
+            decided = list(
+                StudentListedShopItem.objects.filter(id__in=pending, status=status).only(
+                    "id", "name", "description", "status"
+                )
+            )
+            # update() skips the signals that keep the search index current
+            for item in decided:
+                index_item(item)
+
+    if decided:
+        bump_catalog_version()
+    decided = {item.pk for item in decided}
+    return {
+        item_id: result if item_id in decided else "claimed" if item_id in pending else "not_pending"
+        for item_id in item_ids
+    }
@@ -0,0 +1,102 @@
+"""Status changes for vendors' print and shop orders and student sellers' orders."""
+from django.db import transaction
+from django.db.models import Q
+
+from .counters import refresh_order_counters
+from .models import Order, ShopOrder, StudentShopOrder
+
+SHOP_TRANSITIONS = {
+    "pending": {"in_progress", "canceled"},
+    "in_progress": {"delivered", "done", "canceled"},
+    "delivered": {"done"},
+    "done": set(),
+    "canceled": set(),
+}
+
+# Order type -> current status -> statuses it may move to. "student" orders
+# are StudentShopOrders, changed by the student who listed the item.
+ALLOWED_TRANSITIONS = {
+    "print": {
+        "pending": {"in_progress", "done"},
+        "in_progress": {"pending", "done"},
+        "done": set(),
+    },
+    "shop": SHOP_TRANSITIONS,
+    "student": SHOP_TRANSITIONS,
+}
+
+
+def visible_print_orders(user):
+    """
+    Print orders whose document ``user`` may see: their own, the ones
+    assigned to them, and, for approved vendors, unclaimed pending orders.
+    """
+    if user.is_staff:
+        return Order.objects.all()
+    visible = Q(student=user) | Q(vendor=user)
+    if user.role == "vendor" and user.is_approved:
+        visible |= Q(vendor__isnull=True, status="pending")
+    return Order.objects.filter(visible)
+
+
+def vendor_print_queue(vendor):
+    """Print orders on a vendor's work queue: their own and unclaimed pending ones."""
+    return Order.objects.filter(Q(vendor=vendor) | Q(vendor__isnull=True, status="pending"))
+
+
+def vendor_orders_queryset(vendor, order_type):
+    """The orders of ``order_type`` a vendor (or, for "student", a student seller) may change."""
+    if order_type == "print":
+        return Order.objects.filter(vendor=vendor)
+    if order_type == "student":
+        return StudentShopOrder.objects.filter(item__student_vendor=vendor)
+    return ShopOrder.objects.filter(item__vendor=vendor)
+
+
+def bulk_transition(vendor, order_type, order_ids, status):
+    """
+    Moves the vendor's orders in ``order_ids`` to ``status`` with one UPDATE,
+    skipping those whose current status can't make that transition. Returns
+    ``{order_id: result}`` where result is "updated", "unchanged" (already
+    in ``status``), "not_found" (missing or not the vendor's), "conflict"
+    (changed by someone else meanwhile) or "invalid_transition".
+    """
+    transitions = ALLOWED_TRANSITIONS[order_type]
+    if status not in transitions:
+        raise ValueError(f"Unknown {order_type} order status: {status}")
+    allowed_from = [current for current, targets in transitions.items() if status in targets]
+
+    orders = vendor_orders_queryset(vendor, order_type)
+    with transaction.atomic():
+        current = {
+            row[0]: row[1:]
+            for row in orders.select_for_update().filter(id__in=order_ids).values_list(
+                "id", "status", *(["student_id"] if order_type == "print" else [])
+            )
+        }
+        results = {}
+        eligible = []
+        for order_id in order_ids:
+            if order_id not in current:
+                results[order_id] = "not_found"
+            elif current[order_id][0] == status:
+                results[order_id] = "unchanged"
+            elif current[order_id][0] in allowed_from:
+                eligible.append(order_id)
+            else:
+                results[order_id] = "invalid_transition"
+
+        updated = 0
+        if eligible:
+            updated = orders.filter(id__in=eligible, status__in=allowed_from).update(status=status)
+        if updated == len(eligible):
+            results.update(dict.fromkeys(eligible, "updated"))
+        else:
+            # Another request moved some of them between the read and the update
+            moved = set(orders.filter(id__in=eligible, status=status).values_list("id", flat=True))
+            results.update({order_id: "updated" if order_id in moved else "conflict" for order_id in eligible})
+
+        if order_type == "print" and updated:
+            # update() skips the Order signals that keep dashboard counters current
+            refresh_order_counters([vendor.pk, *{current[order_id][1] for order_id in eligible}])
+    return results
@@ -0,0 +1,133 @@
+"""
+HTTP caching policy for the public pages (home, about and the two catalogs).
+
+Each page gets an ETag from a version callable (the deploy for static
+pages, the catalog version for catalogs) plus who it was rendered for, so
+revisits are answered 304 without rendering. Anonymous visitors' pages may
+be stored by shared caches; anyone else's are private and revalidated.
+Pages are never cached while flash messages are waiting to be shown.
+Signed-in users' pages may carry CSRF-protected forms (the vendor's
+Approve buttons on the student shop), so their ETag also covers the CSRF
+secret, which changes on every login. Anonymous pages must not have forms;
+pages that do for everyone (contact) don't use this policy at all.
+"""
+import hashlib
+from functools import lru_cache, wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+from .cart import get_cart_count
+from .catalog import catalog_role, get_catalog_version
+
+
+def deploy_version():
+    return settings.DEPLOY_ID or f"code-{code_fingerprint()}"
+
+
+@lru_cache(maxsize=None)
+def code_fingerprint():
+    """
+    A hash of core's code and templates, the template directories and the
+    static files, so every worker running the same release agrees on it.
+    """
+    roots = [Path(__file__).resolve().parent]
+    for engine in settings.TEMPLATES:
+        roots.extend(Path(directory) for directory in engine.get("DIRS", []))
+    for entry in settings.STATICFILES_DIRS:
+        roots.append(Path(entry[1] if isinstance(entry, (list, tuple)) else entry))
+
+    digest = hashlib.sha256()
+    for root in roots:
+        files = sorted(
+            path for path in root.rglob("*")
+            if path.is_file() and "__pycache__" not in path.parts
+        )
+        for path in files:
+            digest.update(str(path.relative_to(root)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def catalog_version():
+    return f"catalog-{get_catalog_version()}"
+
+
+def _has_pending_messages(request):
+    return bool(request.COOKIES.get(CookieStorage.cookie_name)) or SessionStorage.session_key in request.session
+
+
+def _audience(request):
+    """Who the page was rendered for: everything in base.html that varies by visitor."""
+    user = request.user
+    role = catalog_role(user)
+    if role == "anonymous":
+        return role
+    if role == "student":
+        return f"{role}-{user.pk}-{get_cart_count(user.pk)}"
+    return f"{role}-{user.pk}"
+
+
+def _csrf_version(request):
+    """A digest of the CSRF secret, so cached forms are dropped along with a rotated token."""
+    secret = request.META.get("CSRF_COOKIE", "")
+    return hashlib.sha256(secret.encode()).hexdigest()[:12]
+
+
+def cache_policy(version, public=True, max_age=0, precompute=False):
+    """
+    Applies the caching policy to a view. ``version()`` must change whenever
+    the page's content does. Anonymous responses are ``public`` (shared
+    caches may keep them ``max_age`` seconds) unless ``public`` is False.
+    Not for pages embedding a CSRF token. With ``precompute`` the anonymous
+    page is rendered once per version and served from the cache after that.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or _has_pending_messages(request):
+                response = view_func(request, *args, **kwargs)
+                patch_vary_headers(response, ["Cookie"])
+                return response
+
+            audience = _audience(request)
+            page_version = version()
+            if audience == "anonymous":
+                etag = quote_etag(f"{page_version}-{audience}")
+            else:
+                etag = quote_etag(f"{page_version}-{audience}-{_csrf_version(request)}")
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                if precompute and audience == "anonymous" and not request.GET:
+                    response = _precomputed(view_func, page_version, request, *args, **kwargs)
+                else:
+                    response = view_func(request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response.headers.setdefault("ETag", etag)
+                if public and audience == "anonymous":
+                    patch_cache_control(response, public=True, max_age=max_age)
+                else:
+                    patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ["Cookie"])
+            return response
+        return wrapper
+    return decorator
+
+
+def _precomputed(view_func, page_version, request, *args, **kwargs):
+    key = f"page:{view_func.__module__}.{view_func.__qualname__}:{page_version}"
+    content = cache.get(key)
+    if content is None:
+        response = view_func(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        cache.set(key, response.content, timeout=None)
+        return response
+    return HttpResponse(content)
@@ -0,0 +1,46 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(created_at, pk):
+    """Encodes a ``(created_at, id)`` position as an opaque URL-safe token."""
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Decodes a token from ``encode_cursor``. Raises ValueError if it is malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_order(queryset):
+    """Orders ``queryset`` newest first on ``(created_at, id)``, the order keyset pages walk."""
+    return queryset.order_by("-created_at", "-id")
+
+
+def keyset_page(queryset, cursor=None, page_size=24):
+    """
+    Returns ``(rows, next_cursor)`` for one page of ``queryset``, newest
+    first, ordered on ``(created_at, id)``. ``next_cursor`` is None on the
+    last page. Only ``page_size + 1`` rows are read whatever the page number.
+    """
+    queryset = keyset_order(queryset)
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].pk)
+    return rows, next_cursor
@@ -0,0 +1,67 @@
+"""
+Non-blocking Stripe calls for the async checkout views.
+
+Requests go out through httpx with STRIPE_TIMEOUT and
+STRIPE_MAX_NETWORK_RETRIES. STRIPE_API_BASE sends them to another server,
+such as the bundled fake (``manage.py run_fake_stripe``).
+"""
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+
+import stripe
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+# Event loop -> StripeClient, for ASGI servers whose loop runs every request
+_loop_clients = weakref.WeakKeyDictionary()
+_loop_clients_lock = threading.Lock()
+
+
+def _build_client():
+    """A StripeClient and the httpx-based HTTP client (with its connection pool) it sends through."""
+    http_client = stripe.HTTPXClient(timeout=settings.STRIPE_TIMEOUT)
+    base_addresses = {"api": settings.STRIPE_API_BASE} if settings.STRIPE_API_BASE else {}
+    client = stripe.StripeClient(
+        settings.STRIPE_SECRET_KEY,
+        http_client=http_client,
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+        base_addresses=base_addresses,
+    )
+    return client, http_client
+
+
+@asynccontextmanager
+async def stripe_client(request):
+    """
+    A StripeClient for the view handling ``request``. An httpx connection
+    pool can't outlive its event loop: under ASGI every request on the loop
+    shares one client, while under WSGI each request runs on a loop of its
+    own, so it gets a client whose pool is closed when the block exits.
+    """
+    if isinstance(request, ASGIRequest):
+        loop = asyncio.get_running_loop()
+        with _loop_clients_lock:
+            client = _loop_clients.get(loop)
+            if client is None:
+                client, _ = _build_client()
+                _loop_clients[loop] = client
+        yield client
+        return
+
+    client, http_client = _build_client()
+    try:
+        yield client
+    finally:
+        await http_client.close_async()
+
+
+async def create_checkout_session(request, **params):
+    async with stripe_client(request) as client:
+        return await client.v1.checkout.sessions.create_async(params)
+
+
+async def retrieve_checkout_session(request, session_id):
+    async with stripe_client(request) as client:
+        return await client.v1.checkout.sessions.retrieve_async(session_id)
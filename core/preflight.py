@@ -0,0 +1,195 @@
+"""
+Background preflight of print-order documents: page count, which pages
+need colour, a first-page preview and a price quote.
+
+The parsing in ``analyse_document`` runs in a process pool (it is CPU
+bound), dispatched from a small thread pool that stores the results.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageChops
+
+from .background import run_after_commit
+
+logger = logging.getLogger(__name__)
+
+# A pixel whose channels differ by more than this is coloured, and a page
+# is colour once more than COLOR_PIXEL_RATIO of its pixels are.
+COLOR_CHANNEL_SPREAD = 32
+COLOR_PIXEL_RATIO = 0.001
+RENDER_DPI = 36
+PREVIEW_WIDTH = 320
+
+# Run colours (<w:color w:val=...>) and cell/paragraph shading (w:fill=...)
+DOCX_COLOR = re.compile(rb'<w:color\b[^>]*\bw:val="([0-9A-Fa-f]{6})"|\bw:fill="([0-9A-Fa-f]{6})"')
+
+
+class UnsupportedDocument(Exception):
+    pass
+
+
+def _is_color_image(image):
+    red, green, blue = image.convert("RGB").split()
+    spread = ImageChops.lighter(
+        ImageChops.lighter(ImageChops.difference(red, green), ImageChops.difference(green, blue)),
+        ImageChops.difference(red, blue),
+    )
+    coloured = sum(spread.histogram()[COLOR_CHANNEL_SPREAD + 1:])
+    return coloured > COLOR_PIXEL_RATIO * image.width * image.height
+
+
+def _preview_png(image):
+    height = max(1, round(image.height * PREVIEW_WIDTH / image.width))
+    buffer = io.BytesIO()
+    image.convert("RGB").resize((PREVIEW_WIDTH, height), Image.Resampling.LANCZOS).save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def _analyse_pdf(path):
+    try:
+        import pymupdf
+    except ImportError:
+        raise UnsupportedDocument("PyMuPDF is not installed")
+
+    with pymupdf.open(path) as pdf:
+        color_pages = []
+        preview = None
+        for number, page in enumerate(pdf, start=1):
+            pixmap = page.get_pixmap(dpi=RENDER_DPI, colorspace=pymupdf.csRGB, alpha=False)
+            image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+            if _is_color_image(image):
+                color_pages.append(number)
+            if number == 1:
+                pixmap = page.get_pixmap(dpi=RENDER_DPI * 3, colorspace=pymupdf.csRGB, alpha=False)
+                preview = _preview_png(Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples))
+        return {"page_count": pdf.page_count, "color_pages": color_pages, "preview": preview}
+
+
+def _analyse_docx(path):
+    # Without a layout engine the page count is the one Word saved in
+    # docProps/app.xml, and colour can only be judged for the whole file.
+    with zipfile.ZipFile(path) as docx:
+        try:
+            app = docx.read("docProps/app.xml")
+            page_count = int(re.search(rb"<Pages>(\d+)</Pages>", app).group(1))
+        except (KeyError, AttributeError):
+            raise UnsupportedDocument("No saved page count in the document")
+
+        body = docx.read("word/document.xml")
+        colored = any(
+            len({value[0:2], value[2:4], value[4:6]}) > 1
+            for value in ((match.group(1) or match.group(2)).upper() for match in DOCX_COLOR.finditer(body))
+        )
+        for name in docx.namelist():
+            if colored:
+                break
+            if name.startswith("word/media/"):
+                try:
+                    colored = _is_color_image(Image.open(io.BytesIO(docx.read(name))))
+                except OSError:
+                    continue
+
+    return {
+        "page_count": page_count,
+        "color_pages": list(range(1, page_count + 1)) if colored else [],
+        "preview": None,
+    }
+
+
+def analyse_document(path):
+    """Parses the document at ``path``. Runs in a worker process, so it must not touch the ORM."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        return _analyse_pdf(path)
+    if extension == ".docx":
+        return _analyse_docx(path)
+    raise UnsupportedDocument(f"Cannot preflight {extension or 'extensionless'} files")
+
+
+def compute_quote(page_count, color_page_count):
+    mono = page_count - color_page_count
+    return (
+        mono * Decimal(settings.PRINT_PRICE_PER_PAGE)
+        + color_page_count * Decimal(settings.PRINT_PRICE_PER_COLOR_PAGE)
+    )
+
+
+@lru_cache(maxsize=None)
+def _process_pool():
+    # spawn: the parent has threads, which fork() does not copy safely.
+    return ProcessPoolExecutor(
+        max_workers=settings.PREFLIGHT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _analyse_in_process(path):
+    return _process_pool().submit(analyse_document, path).result()
+
+
+def schedule_preflight(order):
+    """Preflights the order's document in the background once it is committed."""
+    run_after_commit(
+        _preflight, order.pk, order.document.name,
+        async_setting="PREFLIGHT_ASYNC", pool="preflight", workers=settings.PREFLIGHT_WORKERS,
+    )
+
+
+def _preflight(order_id, document):
+    # On the preflight threads the CPU-bound parsing goes to the process pool
+    analyse = _analyse_in_process if settings.PREFLIGHT_ASYNC else analyse_document
+    preflight_order(order_id, document, analyse=analyse)
+
+
+def preflight_order(order_id, document, analyse=analyse_document):
+    """
+    Analyses ``document`` and stores the result on the order, unless the
+    order's document has changed since. Results are reused from any
+    earlier order of the same stored file.
+    """
+    from .models import Order
+
+    orders = Order.objects.filter(pk=order_id, document=document)
+    done = (
+        Order.objects.filter(document=document, preflight_status="done")
+        .exclude(pk=order_id)
+        .values("page_count", "color_pages", "preview", "quote")
+        .first()
+    )
+    if done:
+        orders.update(preflight_status="done", **done)
+        return
+
+    storage = Order._meta.get_field("document").storage
+    try:
+        result = analyse(storage.path(document))
+    except UnsupportedDocument as e:
+        logger.info("Order %s not preflighted: %s", order_id, e)
+        orders.update(preflight_status="unsupported")
+        return
+    except Exception:
+        orders.update(preflight_status="failed")
+        raise
+
+    preview = None
+    if result["preview"]:
+        stem = os.path.splitext(os.path.basename(document))[0]
+        preview = default_storage.save(f"order_previews/{stem}.png", ContentFile(result["preview"]))
+
+    orders.update(
+        preflight_status="done",
+        page_count=result["page_count"],
+        color_pages=result["color_pages"],
+        preview=preview,
+        quote=compute_quote(result["page_count"], len(result["color_pages"])),
+    )
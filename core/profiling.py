@@ -0,0 +1,134 @@
+"""
+Opt-in per-request profiling (REQUEST_PROFILING). For each request it
+records the URL name, SQL query count and time, the slowest statements,
+template render time and total time, sends them back in a
+``Server-Timing`` header and logs them as one JSON line on the
+``core.profiling`` logger. Statements of the same shape repeated more than
+REQUEST_PROFILING_REPEAT_THRESHOLD times are flagged as likely N+1 queries.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger("core.profiling")
+
+# Profile of the request being handled in this context, if any
+_current = ContextVar("request_profile", default=None)
+
+# "IN (%s, %s, %s)" and "IN (%s)" are the same query shape
+PLACEHOLDER_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+
+
+def sql_shape(sql):
+    return PLACEHOLDER_LIST.sub("(%s, ...)", sql)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []  # (duration in ms, sql)
+        self.template_ms = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper timing every statement."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(((time.perf_counter() - start) * 1000, sql))
+
+    def summary(self, request, response):
+        sql_ms = sum(duration for duration, _ in self.queries)
+        shapes = Counter(sql_shape(sql) for _, sql in self.queries)
+        threshold = settings.REQUEST_PROFILING_REPEAT_THRESHOLD
+        match = request.resolver_match
+        return {
+            "method": request.method,
+            "path": request.path,
+            "url_name": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "sql_ms": round(sql_ms, 2),
+            "query_count": len(self.queries),
+            "template_ms": round(self.template_ms, 2),
+            "slowest_queries": [
+                {"ms": round(duration, 2), "sql": sql}
+                for duration, sql in sorted(self.queries, reverse=True)[:settings.REQUEST_PROFILING_SLOWEST]
+            ],
+            "repeated_queries": [
+                {"count": count, "sql": shape}
+                for shape, count in shapes.most_common() if count > threshold
+            ],
+        }
+
+
+def _profiled_render(render):
+    def _render(self, context):
+        profile = _current.get()
+        # Included and extended templates render inside the outermost one
+        if profile is None or profile.template_depth:
+            return render(self, context)
+        profile.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile.template_depth -= 1
+            profile.template_ms += (time.perf_counter() - start) * 1000
+    _render.profiled = True
+    return _render
+
+
+def _install_template_timer():
+    if not getattr(Template._render, "profiled", False):
+        Template._render = _profiled_render(Template._render)
+
+
+def server_timing(summary):
+    return ", ".join([
+        f'sql;dur={summary["sql_ms"]};desc="{summary["query_count"]} queries"',
+        f'tpl;dur={summary["template_ms"]}',
+        f'total;dur={summary["total_ms"]}',
+    ])
+
+
+class RequestProfilingMiddleware:
+    """Profiles each request when REQUEST_PROFILING is on; removes itself otherwise."""
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _install_template_timer()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        summary = profile.summary(request, response)
+        response["Server-Timing"] = server_timing(summary)
+        logger.info(json.dumps(summary))
+        if summary["repeated_queries"]:
+            logger.warning(json.dumps({
+                "url_name": summary["url_name"],
+                "path": summary["path"],
+                "n_plus_one": summary["repeated_queries"],
+            }))
+        return response
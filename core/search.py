@@ -0,0 +1,107 @@
+import re
+
+from django.db import connection
+
+from .models import ShopItem, StudentListedShopItem
+
+FTS_TABLE = "core_listing_fts"
+
+# Both listing tables share one index; the rowid encodes which one a row
+# came from so every update and delete is a rowid lookup.
+KINDS = {"shop": (ShopItem, 0), "student": (StudentListedShopItem, 1)}
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, description, status UNINDEXED, "
+    "tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')"
+)
+DROP_SQL = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+POPULATE_SQL = [
+    f"INSERT INTO {FTS_TABLE} (rowid, name, description, status) "
+    f"SELECT id * 2 + {offset}, name, COALESCE(description, ''), status FROM {table}"
+    for table, offset in (("core_shopitem", 0), ("core_studentlistedshopitem", 1))
+]
+
+# Matches bm25() argument order: name hits outrank description hits.
+NAME_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 1.0
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def search_supported():
+    return connection.vendor == "sqlite"
+
+
+def _rowid(item):
+    for model, offset in KINDS.values():
+        if isinstance(item, model):
+            return item.pk * 2 + offset
+    raise TypeError(f"{type(item).__name__} is not a searchable listing")
+
+
+def index_item(item):
+    """Adds or refreshes one listing in the search index."""
+    if not search_supported():
+        return
+    rowid = _rowid(item)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [rowid])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description, status) VALUES (%s, %s, %s, %s)",
+            [rowid, item.name, item.description or "", item.status],
+        )
+
+
+def unindex_item(item):
+    if not search_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [_rowid(item)])
+
+
+def rebuild_index():
+    """Drops and repopulates the whole search index from the listing tables."""
+    with connection.cursor() as cursor:
+        cursor.execute(DROP_SQL)
+        cursor.execute(CREATE_SQL)
+        for sql in POPULATE_SQL:
+            cursor.execute(sql)
+
+
+def match_expression(query):
+    """Turns free text into an FTS5 query: every word must match, as a prefix."""
+    return " ".join(f'"{token}"*' for token in TOKEN.findall(query))
+
+
+def search_listings(query, kind=None, limit=50):
+    """
+    Returns up to ``limit`` active listings matching ``query``, best bm25
+    rank first, as ``(kind, item)`` pairs. ``kind`` restricts the results
+    to "shop" or "student" listings.
+    """
+    expression = match_expression(query)
+    if not expression or not search_supported():
+        return []
+
+    sql = (
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND status = 'active'"
+    )
+    params = [expression]
+    if kind in KINDS:
+        sql += " AND rowid %% 2 = %s"
+        params.append(KINDS[kind][1])
+    sql += f" ORDER BY bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rowids = [row[0] for row in cursor.fetchall()]
+
+    items = {}
+    for name, (model, offset) in KINDS.items():
+        ids = [rowid // 2 for rowid in rowids if rowid % 2 == offset]
+        if ids:
+            found = model.objects.filter(status="active").prefetch_related("derivatives").in_bulk(ids)
+            items.update({(offset, pk): (name, item) for pk, item in found.items()})
+
+    return [items[rowid % 2, rowid // 2] for rowid in rowids if (rowid % 2, rowid // 2) in items]
@@ -0,0 +1,196 @@
+"""
+Synthetic data for development and benchmarks (``manage.py seed_data`` and
+``manage.py bench_views``). Rows are bulk-inserted, so the derived state
+normally kept by signals (order counters, search index, catalog version)
+is rebuilt once at the end.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from .catalog import bump_catalog_version
+from .counters import refresh_order_counters
+from .models import (
+    Cart, CartItem, Category, CustomUser, Order, ShopItem, ShopOrder, StudentListedShopItem, StudentShopOrder,
+)
+from .search import rebuild_index, search_supported
+
+SEED_PASSWORD = "password"
+PLACEHOLDER_IMAGE = "seed/placeholder.jpg"
+PLACEHOLDER_DOCUMENT = "orders/seed.pdf"
+# A blank one-page PDF
+PLACEHOLDER_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+DEFAULT_VOLUMES = {
+    "students": 200,
+    "vendors": 10,
+    "categories": 12,
+    "shop_items": 500,
+    "student_items": 300,
+    "carts": 100,
+    "print_orders": 2000,
+    "shop_orders": 2000,
+    "student_orders": 500,
+}
+
+WORDS = (
+    "calculus physics circuits algorithms notes guide lab manual compiler networks "
+    "discrete statistics drawing kit calculator pen set graph paper marker economics "
+    "chemistry biology thermodynamics database systems robotics sketchbook"
+).split()
+
+
+def _name(rng, words=3):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).title()
+
+
+def _price(rng):
+    return Decimal(rng.randrange(50, 50000)) / 100
+
+
+def _spread(rng, objects, days, now):
+    """Backdates ``created_at`` (set to now by auto_now_add) across the last ``days`` days."""
+    if not objects:
+        return
+    for obj in objects:
+        obj.created_at = now - timedelta(seconds=rng.randrange(days * 86400))
+    type(objects[0]).objects.bulk_update(objects, ["created_at"], batch_size=500)
+
+
+def _placeholder_image():
+    """Stores (once) the small image every seeded listing shows."""
+    if not default_storage.exists(PLACEHOLDER_IMAGE):
+        buffer = BytesIO()
+        Image.new("RGB", (640, 480), (72, 118, 201)).save(buffer, "JPEG")
+        default_storage.save(PLACEHOLDER_IMAGE, ContentFile(buffer.getvalue()))
+    return PLACEHOLDER_IMAGE
+
+
+def _placeholder_document():
+    """Stores (once) the document every seeded print order points at."""
+    if not default_storage.exists(PLACEHOLDER_DOCUMENT):
+        default_storage.save(PLACEHOLDER_DOCUMENT, ContentFile(PLACEHOLDER_PDF))
+    return PLACEHOLDER_DOCUMENT
+
+
+def _users(prefix, role, count, password, **fields):
+    return CustomUser.objects.bulk_create([
+        CustomUser(username=f"{prefix}_{role}_{i}", email=f"{prefix}_{role}_{i}@example.com",
+                   password=password, role=role, **fields)
+        for i in range(count)
+    ])
+
+
+@transaction.atomic
+def seed(volumes=None, prefix="seed", rng=None, days=180):
+    """
+    Creates users, categories, listings, carts and orders in the given
+    ``volumes`` (see DEFAULT_VOLUMES) and returns the number of rows of each.
+    Every seeded user's password is SEED_PASSWORD.
+    """
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    password = make_password(SEED_PASSWORD)
+    image = _placeholder_image()
+    document = _placeholder_document()
+
+    students = _users(prefix, "student", volumes["students"], password)
+    vendors = _users(prefix, "vendor", volumes["vendors"], password, is_approved=True)
+    categories = Category.objects.bulk_create([
+        Category(name=f"{prefix} {_name(rng, 2)} {i}") for i in range(volumes["categories"])
+    ])
+
+    shop_items = ShopItem.objects.bulk_create([
+        ShopItem(
+            vendor=rng.choice(vendors), category=rng.choice(categories), name=_name(rng),
+            description=_name(rng, 12), price=_price(rng), image=image,
+            status="active" if rng.random() < 0.85 else "inactive",
+        )
+        for _ in range(volumes["shop_items"])
+    ])
+    _spread(rng, shop_items, days, now)
+    student_items = StudentListedShopItem.objects.bulk_create([
+        StudentListedShopItem(
+            student_vendor=rng.choice(students), category=rng.choice(categories), name=_name(rng),
+            description=_name(rng, 12), price=_price(rng), image=image,
+            status="active" if rng.random() < 0.7 else "inactive",
+        )
+        for _ in range(volumes["student_items"])
+    ])
+    _spread(rng, student_items, days, now)
+
+    carts = Cart.objects.bulk_create([Cart(user=student) for student in students[:volumes["carts"]]])
+    cart_items = CartItem.objects.bulk_create([
+        CartItem(cart=cart, item=item, quantity=rng.randint(1, 3))
+        for cart in carts
+        for item in rng.sample(shop_items, min(len(shop_items), rng.randint(1, 6)))
+    ])
+
+    statuses = [status for status, _ in Order.STATUS_CHOICES]
+    print_orders = Order.objects.bulk_create([
+        Order(
+            student=rng.choice(students),
+            vendor=rng.choice(vendors) if rng.random() < 0.9 else None,
+            document=document, document_name="notes.pdf",
+            status=rng.choice(statuses), preflight_status="done",
+            page_count=(pages := rng.randint(1, 120)), quote=Decimal(pages * 2),
+        )
+        for _ in range(volumes["print_orders"])
+    ])
+    _spread(rng, print_orders, days, now)
+
+    shop_statuses = [status for status, _ in ShopOrder.STATUS_CHOICES]
+    shop_orders = ShopOrder.objects.bulk_create([
+        ShopOrder(
+            buyer=rng.choice(students), item=rng.choice(shop_items), quantity=rng.randint(1, 3),
+            status=rng.choice(shop_statuses), payment_status="Paid",
+            delivery_details="Name: Seed\nPhone: 01700000000\nAddress: UIU Campus",
+        )
+        for _ in range(volumes["shop_orders"])
+    ])
+    _spread(rng, shop_orders, days, now)
+    student_orders = StudentShopOrder.objects.bulk_create([
+        StudentShopOrder(
+            buyer=rng.choice(students), item=rng.choice(student_items), quantity=1,
+            status=rng.choice(shop_statuses),
+        )
+        for _ in range(volumes["student_orders"] if student_items else 0)
+    ])
+    _spread(rng, student_orders, days, now)
+
+    user_ids = [user.pk for user in students + vendors]
+    for start in range(0, len(user_ids), 500):
+        refresh_order_counters(user_ids[start:start + 500])
+    if search_supported():
+        rebuild_index()
+    transaction.on_commit(bump_catalog_version)
+
+    return {
+        "students": len(students), "vendors": len(vendors), "categories": len(categories),
+        "shop_items": len(shop_items), "student_items": len(student_items), "carts": len(carts),
+        "cart_items": len(cart_items), "print_orders": len(print_orders),
+        "shop_orders": len(shop_orders), "student_orders": len(student_orders),
+    }
+
+
+def unseed(prefix="seed"):
+    """Deletes everything a previous ``seed(prefix=...)`` created."""
+    CustomUser.objects.filter(username__startswith=f"{prefix}_").delete()
+    Category.objects.filter(name__startswith=f"{prefix} ").delete()
+    if search_supported():
+        rebuild_index()
+    bump_catalog_version()
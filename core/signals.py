@@ -0,0 +1,124 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .assignment import assignment_state, invalidate_vendor_rotation
+from .catalog import bump_catalog_version
+from .counters import UNKNOWN, apply_order_change, counted_state, refresh_order_counters, sync_assignable
+from .documents import document_name, release_document, retain_document
+from .images import delete_derivative_file, needs_derivatives, schedule_derivatives
+from .models import Category, CustomUser, ImageDerivative, Order, ShopItem, StudentListedShopItem
+from .search import index_item, unindex_item
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ShopItem)
+@receiver(post_delete, sender=ShopItem)
+@receiver(post_save, sender=StudentListedShopItem)
+@receiver(post_delete, sender=StudentListedShopItem)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=ShopItem)
+@receiver(post_save, sender=StudentListedShopItem)
+def index_listing(sender, instance, **kwargs):
+    index_item(instance)
+
+
+@receiver(post_delete, sender=ShopItem)
+@receiver(post_delete, sender=StudentListedShopItem)
+def unindex_listing(sender, instance, **kwargs):
+    unindex_item(instance)
+
+
+@receiver(post_save, sender=ShopItem)
+@receiver(post_save, sender=StudentListedShopItem)
+def resize_listing_image(sender, instance, **kwargs):
+    if needs_derivatives(instance):
+        schedule_derivatives(instance)
+
+
+@receiver(post_delete, sender=ImageDerivative)
+def delete_derivative_image(sender, instance, **kwargs):
+    # Also covers derivatives cascaded away with their listing
+    delete_derivative_file(instance)
+
+
+@receiver(post_init, sender=Order)
+def remember_counted_state(sender, instance, **kwargs):
+    instance._counted_state = None if instance.pk is None else counted_state(instance)
+
+
+@receiver(post_init, sender=Order)
+def remember_document(sender, instance, **kwargs):
+    instance._stored_document = document_name(instance.__dict__.get("document"))
+
+
+@receiver(post_save, sender=Order)
+def count_saved_order(sender, instance, created, **kwargs):
+    old = None if created else instance._counted_state
+    new = counted_state(instance)
+    if old is UNKNOWN or new is UNKNOWN:
+        instance.refresh_from_db(fields=["student", "vendor", "status"])
+        new = counted_state(instance)
+        refresh_order_counters({new[0], new[1]} - {None})
+    else:
+        apply_order_change(old, new)
+    instance._counted_state = new
+
+
+@receiver(post_delete, sender=Order)
+def count_deleted_order(sender, instance, **kwargs):
+    state = counted_state(instance)
+    if state is UNKNOWN:
+        return
+    # Counters of users being deleted in the same cascade may already be gone.
+    apply_order_change(state, None, create_missing=False)
+
+
+@receiver(post_save, sender=Order)
+def count_document_reference(sender, instance, created, **kwargs):
+    if "document" not in instance.__dict__:
+        return
+    old = None if created else instance._stored_document
+    new = document_name(instance.document)
+    if old != new:
+        if new:
+            retain_document(new)
+        if old:
+            release_document(old)
+    instance._stored_document = new
+
+
+@receiver(post_delete, sender=Order)
+def release_document_reference(sender, instance, **kwargs):
+    if "document" in instance.__dict__:
+        release_document(document_name(instance.document))
+
+
+@receiver(post_init, sender=CustomUser)
+def remember_assignment_state(sender, instance, **kwargs):
+    instance._assignment_state = None if instance.pk is None else assignment_state(instance)
+
+
+@receiver(post_save, sender=CustomUser)
+def update_vendor_availability(sender, instance, created, **kwargs):
+    old = None if created else instance._assignment_state
+    new = assignment_state(instance)
+    instance._assignment_state = new
+    if old is UNKNOWN or new is UNKNOWN:
+        changed = True
+    elif old is None:
+        changed = new[0] == "vendor"
+    else:
+        changed = old != new
+    if changed:
+        sync_assignable(instance)
+        invalidate_vendor_rotation()
+
+
+@receiver(post_delete, sender=CustomUser)
+def forget_vendor(sender, instance, **kwargs):
+    if instance.role == "vendor":
+        invalidate_vendor_rotation()
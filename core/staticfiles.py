@@ -0,0 +1,55 @@
+import gzip
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # brotli is optional: without it only .gz variants are built
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".map", ".svg", ".json", ".txt", ".xml", ".html", ".ico"}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Hashed static files (``app.3f2a1c.css``) that can be cached forever,
+    each text asset also written as ``.gz`` and, with brotli installed,
+    ``.br`` next to it for the front server to send as is
+    (nginx ``gzip_static``/``brotli_static``).
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = {}  # files can come back once per post-processing pass
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names[name] = hashed_name
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+        for hashed_name in hashed_names.values():
+            if os.path.splitext(hashed_name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            for compressed_name in self._compress(hashed_name):
+                yield compressed_name, compressed_name, True
+
+    def _compress(self, name):
+        with self.open(name) as f:
+            original = f.read()
+        if len(original) < settings.STATIC_COMPRESS_MIN_SIZE:
+            return
+        variants = [(".gz", gzip.compress(original, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(original, mode=brotli.MODE_TEXT)))
+        for suffix, compressed in variants:
+            # Only worth keeping when it saves something
+            if len(compressed) >= len(original):
+                continue
+            compressed_name = name + suffix
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+            yield compressed_name
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_ADDRESSED_NAME = re.compile(r"(?:^|/)[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(?:\.\w+)?$")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each distinct file once under ``<upload_to>/<aa>/<sha256><ext>``.
+    Uploads are hashed chunk by chunk as they are received or written to a
+    temporary file, and a second upload of the same bytes reuses the stored copy.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content, so it is chosen in _save().
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        staging_dir = self.path(os.path.join(directory, ".incoming"))
+        os.makedirs(staging_dir, exist_ok=True)
+
+        if hasattr(content, "temporary_file_path"):
+            # Already on disk: move it, no copy needed. Uploads were hashed
+            # while being received (core.uploads); anything else is hashed in place.
+            staged = content.temporary_file_path()
+            digest = getattr(content, "sha256", None)
+            if digest is None:
+                sha256 = hashlib.sha256()
+                with open(staged, "rb") as f:
+                    for chunk in iter(lambda: f.read(content.DEFAULT_CHUNK_SIZE), b""):
+                        sha256.update(chunk)
+                digest = sha256.hexdigest()
+        else:
+            sha256 = hashlib.sha256()
+            fd, staged = tempfile.mkstemp(dir=staging_dir)
+            with os.fdopen(fd, "wb") as f:
+                for chunk in content.chunks():
+                    sha256.update(chunk)
+                    f.write(chunk)
+            digest = sha256.hexdigest()
+
+        final_name = os.path.join(directory, digest[:2], digest + extension).replace("\\", "/")
+        full_path = self.path(final_name)
+        if os.path.exists(full_path):
+            if not hasattr(content, "temporary_file_path"):
+                os.unlink(staged)
+            return final_name
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        file_move_safe(staged, full_path, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return final_name
+
+
+def content_digest(name):
+    """The SHA-256 a content-addressed file name was derived from, or None."""
+    match = CONTENT_ADDRESSED_NAME.search(name or "")
+    return match.group("digest") if match else None
+
+
+def document_storage():
+    # Left to default to MEDIA_ROOT/MEDIA_URL so it follows overridden settings
+    return ContentAddressedStorage()
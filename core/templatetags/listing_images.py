@@ -0,0 +1,34 @@
+from django import template
+
+register = template.Library()
+
+# Matches the col-sm-6 col-md-4 col-lg-3 card grid of the shop pages.
+GRID_SIZES = "(min-width: 992px) 25vw, (min-width: 768px) 33vw, (min-width: 576px) 50vw, 100vw"
+
+
+def _srcset(derivatives):
+    return ", ".join(f"{d.image.url} {d.width}w" for d in derivatives)
+
+
+@register.inclusion_tag("store/listing_picture.html")
+def listing_picture(item, sizes=GRID_SIZES, css_class="", style=""):
+    """
+    Renders ``item.image`` as a <picture> with WebP and JPEG srcsets built
+    from its derivatives, falling back to the original until they exist.
+    Prefetch ``derivatives`` on listings to keep this query-free.
+    """
+    current = sorted(
+        (d for d in item.derivatives.all() if d.source == item.image.name),
+        key=lambda d: d.width,
+    )
+    webp = [d for d in current if d.format == "webp"]
+    jpeg = [d for d in current if d.format == "jpeg"]
+    return {
+        "item": item,
+        "src": jpeg[-1].image.url if jpeg else item.image.url,
+        "webp_srcset": _srcset(webp),
+        "jpeg_srcset": _srcset(jpeg),
+        "sizes": sizes,
+        "css_class": css_class,
+        "style": style,
+    }
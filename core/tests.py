@@ -1,3 +1,870 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import importlib
+import json
+import random
+import re
+import shutil
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import QuerySet
+from django.test import (
+    AsyncRequestFactory, Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+
+from asgiref.sync import async_to_sync
+from PIL import Image, ImageOps
+
+from .assignment import least_outstanding
+from .bench import ANONYMOUS, ROUTES, make_fixtures
+from .cart import place_cart_orders
+from .fake_stripe import serve_in_thread
+from .moderation import moderate_items
+from .models import (
+    Cart, CartItem, Category, CustomUser, ImageDerivative, Order, OrderCounter, ShopItem, ShopOrder, StripeEvent,
+    StudentListedShopItem, StudentShopOrder,
+)
+from . import images, payments
+from .background import executor, run_after_commit
+from .page_cache import code_fingerprint, deploy_version
+from .search import search_listings
+from .seeding import seed
+from .uploads import HashingTemporaryFileUploadHandler
+from .vendors import delete_rejected_vendors, pending_vendors, reject_vendors
+from .webhooks import HANDLERS, process_event
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+# Tests render pages with DEBUG off and without collectstatic's manifest
+plain_static_storage = override_settings(STORAGES={
+    **settings.STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+
+
+def setUpModule():
+    plain_static_storage.enable()
+
+
+def tearDownModule():
+    plain_static_storage.disable()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_ACCEL="")
+class ServeMediaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = CustomUser.objects.create_user("media_student", password="pw", role="student")
+        cls.vendor = CustomUser.objects.create_user("media_vendor", password="pw", role="vendor", is_approved=True)
+        cls.order = Order(student=cls.student, vendor=cls.vendor)
+        cls.order.document.save("notes.pdf", ContentFile(b"%PDF-1.4 test"), save=False)
+        cls.order.save()
+        cls.document = cls.order.document.name
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_private_document_needs_login(self):
+        response = self.client.get(f"/media/{self.document}")
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/login/", response["Location"])
+
+    def test_order_student_gets_document(self):
+        self.client.force_login(self.student)
+        response = self.client.get(f"/media/{self.document}")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_other_student_gets_404(self):
+        other = CustomUser.objects.create_user("media_other", password="pw", role="student")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(f"/media/{self.document}").status_code, 404)
+
+    def test_non_canonical_paths_are_refused(self):
+        for url in (
+            f"/media/./{self.document}",
+            f"/media/shop_items/../{self.document}",
+            f"/media/x/%2e%2e/{self.document}",
+            f"/media/x/%2E%2E/{self.document}",
+            f"/media/orders//{self.document.split('/', 1)[1]}",
+            f"/media/{self.document}/.",
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertNotIn("public", response.get("Cache-Control", ""))
+
+
+class VendorAvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user("assign_vendor", password="pw", role="vendor", is_approved=True)
+        cls.student = CustomUser.objects.create_user("assign_student", password="pw", role="student")
+
+    def test_new_approved_vendor_is_assignable(self):
+        self.assertTrue(OrderCounter.objects.get(user=self.vendor).assignable)
+        self.assertEqual(least_outstanding(None), self.vendor.pk)
+
+    def test_deactivating_vendor_stops_assignment(self):
+        self.vendor.is_active = False
+        self.vendor.save()
+        self.assertFalse(OrderCounter.objects.get(user=self.vendor).assignable)
+        self.assertIsNone(least_outstanding(None))
+
+    def test_other_saves_leave_counters_alone(self):
+        self.student.first_name = "Renamed"
+        with self.assertNumQueries(1):
+            self.student.save()
+        self.vendor.first_name = "Renamed"
+        with self.assertNumQueries(1):
+            self.vendor.save()
+
+    def test_vendor_without_counter_row_is_still_chosen(self):
+        OrderCounter.objects.all().delete()
+        self.assertEqual(least_outstanding(None), self.vendor.pk)
+
+
+# (cold cache, warm cache) queries per request of the busiest routes. The
+# cold count includes rebuilding the cached catalog or cart badge; a change
+# in either usually means an N+1 crept in.
+HOT_ROUTE_QUERIES = {
+    "home": (0, 0),
+    "student_dashboard": (5, 4),
+    "vendor_dashboard": (4, 4),
+    "student_orders": (5, 4),
+    "shop": (7, 2),
+    "shop_items": (7, 5),
+    "studentshop": (7, 2),
+    "search": (10, 7),
+    "vendor_orders": (5, 5),
+    "student_vendor_orders": (4, 3),
+    "my_store": (5, 4),
+    "moderation_queue": (4, 4),
+    "view_cart": (6, 4),
+    "api_shop_items": (3, 2),
+    "api_student_items": (3, 2),
+}
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT, IMAGE_DERIVATIVES_ASYNC=False, PREFLIGHT_ASYNC=False, STRIPE_EVENTS_ASYNC=False
+)
+class HotRouteQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed(
+            {
+                "students": 20, "vendors": 3, "categories": 4, "shop_items": 40, "student_items": 30,
+                "carts": 10, "print_orders": 100, "shop_orders": 100, "student_orders": 40,
+            },
+            rng=random.Random(0),
+        )
+        cls.fixtures = make_fixtures()
+
+    def test_query_counts(self):
+        for name, (cold, warm) in HOT_ROUTE_QUERIES.items():
+            role, kwargs, query = ROUTES[name]
+            path = reverse(name, kwargs=kwargs(self.fixtures) if kwargs else None)
+            if query:
+                path = f"{path}?{query}"
+            with self.subTest(route=name):
+                cache.clear()
+                ContentType.objects.clear_cache()
+                self.client.logout()
+                if role != ANONYMOUS:
+                    self.client.force_login(self.fixtures[role])
+                with self.assertNumQueries(cold):
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(warm):
+                    self.client.get(path)
+
+
+@override_settings(VENDOR_DELETES_ASYNC=False)
+class VendorRejectionTests(TestCase):
+    def test_only_rejected_vendors_are_deleted(self):
+        pending = CustomUser.objects.create_user("reject_pending", password="pw", role="vendor")
+        suspended = CustomUser.objects.create_user("reject_suspended", password="pw", role="vendor", is_active=False)
+        with self.captureOnCommitCallbacks():
+            self.assertEqual(reject_vendors([pending.pk]), [pending.pk])
+        pending.refresh_from_db()
+        self.assertFalse(pending.is_active)
+        self.assertIsNotNone(pending.rejected_at)
+        self.assertNotIn(pending, pending_vendors())
+
+        # The deletion scheduled on commit did not run; the command catches up
+        self.assertEqual(delete_rejected_vendors(), 1)
+        self.assertFalse(CustomUser.objects.filter(pk=pending.pk).exists())
+        self.assertTrue(CustomUser.objects.filter(pk=suspended.pk).exists())
+
+
+class OrderStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user("status_vendor", password="pw", role="vendor", is_approved=True)
+        cls.seller = CustomUser.objects.create_user("status_seller", password="pw", role="student")
+        cls.buyer = CustomUser.objects.create_user("status_buyer", password="pw", role="student")
+        cls.print_order = Order.objects.create(
+            student=cls.buyer, vendor=cls.vendor, document="orders/status.pdf", status="done"
+        )
+        item = StudentListedShopItem.objects.create(student_vendor=cls.seller, name="Notes", price=50, status="active")
+        cls.orders = [StudentShopOrder.objects.create(buyer=cls.buyer, item=item) for _ in range(2)]
+        other_item = StudentListedShopItem.objects.create(student_vendor=cls.buyer, name="Pens", price=20)
+        cls.other_order = StudentShopOrder.objects.create(buyer=cls.seller, item=other_item)
+
+    def test_single_update_follows_transitions(self):
+        self.client.force_login(self.vendor)
+        url = reverse("update_order_status", args=["print", self.print_order.pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.client.post(url, {"status": "pending"})
+        self.print_order.refresh_from_db()
+        self.assertEqual(self.print_order.status, "done")
+
+    def test_student_single_update(self):
+        self.client.force_login(self.seller)
+        order = self.orders[0]
+        self.client.post(reverse("update_student_order_status", args=["shop", order.pk]), {"status": "delivered"})
+        order.refresh_from_db()
+        self.assertEqual(order.status, "pending")
+        self.client.post(reverse("update_student_order_status", args=["shop", order.pk]), {"status": "in_progress"})
+        order.refresh_from_db()
+        self.assertEqual(order.status, "in_progress")
+        response = self.client.post(
+            reverse("update_student_order_status", args=["shop", self.other_order.pk]), {"status": "in_progress"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_student_bulk_update(self):
+        self.client.force_login(self.seller)
+        ids = [order.pk for order in self.orders] + [self.other_order.pk]
+        response = self.client.post(
+            reverse("bulk_update_student_order_status"),
+            {"order_type": "student", "status": "in_progress", "ids": ids},
+            headers={"X-Requested-With": "XMLHttpRequest"},
+        )
+        results = response.json()["results"]
+        self.assertEqual([results[str(order_id)] for order_id in ids], ["updated", "updated", "not_found"])
+        self.other_order.refresh_from_db()
+        self.assertEqual(self.other_order.status, "pending")
+
+    def test_vendors_cannot_use_student_bulk_path(self):
+        self.client.force_login(self.vendor)
+        response = self.client.post(
+            reverse("bulk_update_order_status"),
+            {"order_type": "student", "status": "in_progress", "ids": [self.orders[0].pk]},
+            headers={"X-Requested-With": "XMLHttpRequest"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class PageCacheTests(TestCase):
+    @override_settings(DEPLOY_ID="")
+    def test_default_deploy_id_is_stable(self):
+        version = deploy_version()
+        code_fingerprint.cache_clear()
+        # What another worker starting the same release computes
+        self.assertEqual(deploy_version(), version)
+
+    def test_contact_always_issues_csrf(self):
+        first = self.client.get(reverse("contact"))
+        self.assertNotIn("ETag", first)
+        response = self.client.get(reverse("contact"), headers={"If-None-Match": "*"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "csrfmiddlewaretoken")
+        self.assertIn("csrftoken", response.cookies)
+
+    def test_forms_on_cached_pages_follow_csrf_rotation(self):
+        vendor = CustomUser.objects.create_user("csrf_vendor", password="pw", role="vendor", is_approved=True)
+        StudentListedShopItem.objects.create(
+            student_vendor=CustomUser.objects.create_user("csrf_seller", password="pw", role="student"),
+            name="Pending notes", price=50, category=Category.objects.create(name="Notes"),
+        )
+        client = Client(enforce_csrf_checks=True)
+
+        def log_in():
+            client.get(reverse("login"))
+            client.post(reverse("login"), {
+                "username": "csrf_vendor", "password": "pw",
+                "csrfmiddlewaretoken": client.cookies["csrftoken"].value,
+            })
+
+        log_in()
+        first = client.get(reverse("studentshop"))
+        self.assertEqual(first.status_code, 200)
+        client.get(reverse("logout"))
+        log_in()
+        response = client.get(reverse("studentshop"), headers={"If-None-Match": first["ETag"]})
+        # The cached copy's Approve forms carry the token from before the login
+        self.assertEqual(response.status_code, 200)
+        token = re.search(rb'name="csrfmiddlewaretoken" value="([^"]+)"', response.content)[1].decode()
+        item = StudentListedShopItem.objects.get()
+        approve = client.post(reverse("approve_student_item", args=[item.pk]), {"csrfmiddlewaretoken": token})
+        self.assertEqual(approve.status_code, 302)
+        self.assertEqual(vendor.pk, StudentListedShopItem.objects.get().approved_by_id)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MAX_DOCUMENT_UPLOAD_SIZE=64 * 1024, FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+class CreateOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = CustomUser.objects.create_user("upload_student", password="pw", role="student")
+
+    def setUp(self):
+        # CSRF checks on, so the body is parsed by the middleware, as in production
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.student)
+        self.client.get(reverse("create_order"))
+        self.token = self.client.cookies["csrftoken"].value
+
+    def upload(self, content):
+        document = SimpleUploadedFile("notes.pdf", content, content_type="application/pdf")
+        with mock.patch.object(
+            HashingTemporaryFileUploadHandler, "receive_data_chunk", autospec=True,
+            side_effect=HashingTemporaryFileUploadHandler.receive_data_chunk,
+        ) as received:
+            response = self.client.post(
+                reverse("create_order"), {"csrfmiddlewaretoken": self.token, "document": document}
+            )
+        return response, sum(len(call.args[1]) for call in received.call_args_list)
+
+    def test_upload_is_hashed_while_received(self):
+        content = b"%PDF-1.4 " + b"x" * 10000
+        response, received = self.upload(content)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(received, len(content))
+        order = Order.objects.get(student=self.student)
+        self.assertIn(hashlib.sha256(content).hexdigest(), order.document.name)
+
+    def test_oversized_upload_stops_being_read(self):
+        with override_settings(MAX_DOCUMENT_UPLOAD_SIZE=16 * 1024, FILE_UPLOAD_HANDLERS=[
+            "core.uploads.HashingTemporaryFileUploadHandler",
+        ]):
+            # Declared too large: refused before the file is read at all
+            response, received = self.upload(b"x" * 200 * 1024)
+            self.assertEqual(response.status_code, 413)
+            self.assertEqual(received, 0)
+        # Within the request allowance, but the file itself is over the cap
+        with override_settings(MAX_DOCUMENT_UPLOAD_SIZE=40 * 1024):
+            response, received = self.upload(b"x" * 100 * 1024)
+        self.assertEqual(response.status_code, 413)
+        self.assertLessEqual(received, 40 * 1024 + 64 * 1024)
+        self.assertFalse(Order.objects.exists())
+
+    def test_malformed_content_length_is_a_bad_request(self):
+        # Django reads no body for it, so with CSRF checks the middleware refuses it first
+        response = self.client.post(reverse("create_order"), {}, CONTENT_LENGTH="lots")
+        self.assertEqual(response.status_code, 403)
+        client = Client()
+        client.force_login(self.student)
+        response = client.post(reverse("create_order"), {}, CONTENT_LENGTH="lots")
+        self.assertEqual(response.status_code, 400)
+
+
+class StripeClientTests(SimpleTestCase):
+    def built_clients(self, request, uses):
+        built, build_client = [], payments._build_client
+
+        def build():
+            built.append(build_client())
+            return built[-1]
+
+        async def use():
+            for _ in range(uses):
+                async with payments.stripe_client(request):
+                    pass
+
+        with mock.patch.object(payments, "_build_client", side_effect=build):
+            async_to_sync(use)()
+            async_to_sync(use)()
+        return built
+
+    def test_wsgi_requests_close_their_pool(self):
+        built = self.built_clients(RequestFactory().get("/"), uses=2)
+        self.assertEqual(len(built), 4)
+        self.assertTrue(all(http_client._client_async.is_closed for _, http_client in built))
+
+    def test_asgi_requests_share_a_client_per_loop(self):
+        built = self.built_clients(AsyncRequestFactory().get("/"), uses=2)
+        # One per event loop (async_to_sync runs each call on a new one)
+        self.assertEqual(len(built), 2)
+
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.stripe = serve_in_thread()
+        cls.enterClassContext(override_settings(STRIPE_API_BASE=cls.stripe.base_url, STRIPE_WEBHOOK_SECRET=""))
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.stripe.shutdown()
+
+    @classmethod
+    def setUpTestData(cls):
+        vendor = CustomUser.objects.create_user("checkout_vendor", password="pw", role="vendor", is_approved=True)
+        cls.student = CustomUser.objects.create_user("checkout_student", password="pw", role="student")
+        cls.item = ShopItem.objects.create(vendor=vendor, name="Pen", price="25.00", status="active")
+
+    def setUp(self):
+        self.client.force_login(self.student)
+        self.stripe.paid = True
+
+    def fill_cart(self):
+        cart = Cart.objects.create(user=self.student)
+        CartItem.objects.create(cart=cart, item=self.item, quantity=2)
+        session = self.client.session
+        session["delivery_details"] = {"name": "Rafi", "phone": "01700000000", "address": "Hall 3"}
+        session.save()
+
+    def test_order_checkout_records_the_session(self):
+        order = ShopOrder.objects.create(buyer=self.student, item=self.item, quantity=3)
+        response = self.client.get(reverse("create_checkout_session", args=[order.id]))
+        session_id = response.json()["id"]
+        order.refresh_from_db()
+        self.assertEqual(order.stripe_session_id, session_id)
+        self.assertEqual(self.stripe.sessions[session_id]["amount_total"], 7500)
+
+    def test_paid_order_is_marked_paid(self):
+        order = ShopOrder.objects.create(buyer=self.student, item=self.item)
+        session_id = self.client.get(reverse("create_checkout_session", args=[order.id])).json()["id"]
+        response = self.client.get(reverse("payment_success") + f"?session_id={session_id}")
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.payment_status, "Paid")
+
+    def test_empty_cart_is_not_checked_out(self):
+        response = self.client.get(reverse("create_cart_checkout_session"))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.stripe.sessions)
+
+    def test_paid_cart_is_placed_once(self):
+        self.fill_cart()
+        session_id = self.client.get(reverse("create_cart_checkout_session")).json()["id"]
+        success_url = reverse("payment_success") + f"?session_id={session_id}"
+        for _ in range(2):
+            # The second visit replays the success URL
+            response = self.client.get(success_url)
+            self.assertEqual(response.status_code, 200)
+        order = ShopOrder.objects.get(buyer=self.student)
+        self.assertEqual((order.quantity, order.payment_status), (2, "Paid"))
+        self.assertIn("Hall 3", order.delivery_details)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_unpaid_cart_is_not_placed(self):
+        self.stripe.paid = False
+        self.fill_cart()
+        session_id = self.client.get(reverse("create_cart_checkout_session")).json()["id"]
+        response = self.client.get(reverse("payment_success") + f"?session_id={session_id}")
+        self.assertRedirects(response, reverse("payment_cancel"))
+        self.assertFalse(ShopOrder.objects.exists())
+        self.assertTrue(CartItem.objects.exists())
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET="whsec_test", STRIPE_EVENTS_ASYNC=False)
+class StripeWebhookTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor = CustomUser.objects.create_user("webhook_vendor", password="pw", role="vendor", is_approved=True)
+        cls.student = CustomUser.objects.create_user("webhook_student", password="pw", role="student")
+        item = ShopItem.objects.create(vendor=vendor, name="Pen", price="25.00", status="active")
+        CartItem.objects.create(cart=Cart.objects.create(user=cls.student), item=item, quantity=2)
+
+    def deliver(self, event_id="evt_test_1", secret="whsec_test"):
+        # Signed the way Stripe (and FakeStripeServer.send_event) signs
+        payload = json.dumps({
+            "id": event_id,
+            "object": "event",
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "id": "cs_test_1",
+                "object": "checkout.session",
+                "payment_status": "paid",
+                "metadata": {"user_id": str(self.student.id), "delivery_address": "Hall 3"},
+            }},
+        })
+        timestamp = int(time.time())
+        signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse("stripe_webhook"), payload, content_type="application/json",
+                HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+            )
+
+    def test_bad_signature_is_rejected(self):
+        response = self.deliver(secret="whsec_other")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+        self.assertFalse(ShopOrder.objects.exists())
+
+    def test_redelivered_event_is_fulfilled_once(self):
+        for _ in range(2):
+            self.assertEqual(self.deliver().status_code, 200)
+        event = StripeEvent.objects.get()
+        self.assertIsNotNone(event.processed_at)
+        self.assertEqual(event.attempts, 1)
+        order = ShopOrder.objects.get()
+        self.assertEqual((order.buyer, order.quantity, order.payment_status), (self.student, 2, "Paid"))
+
+    def test_failed_event_is_recorded_for_retry(self):
+        failing = mock.Mock(side_effect=RuntimeError("database is locked"))
+        with mock.patch.dict(HANDLERS, {"checkout.session.completed": failing}):
+            with self.assertRaises(RuntimeError):
+                self.deliver()
+        event = StripeEvent.objects.get()
+        self.assertIsNone(event.processed_at)
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("database is locked", event.error)
+        self.assertFalse(ShopOrder.objects.exists())
+        # A retry runs the real handler and clears the error
+        process_event(event.pk)
+        event.refresh_from_db()
+        self.assertIsNotNone(event.processed_at)
+        self.assertEqual((event.attempts, event.error), (2, ""))
+        self.assertTrue(ShopOrder.objects.exists())
+
+
+class PlaceCartOrdersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor = CustomUser.objects.create_user("cart_vendor", password="pw", role="vendor", is_approved=True)
+        cls.student = CustomUser.objects.create_user("cart_student", password="pw", role="student")
+        cls.item = ShopItem.objects.create(vendor=vendor, name="Pen", price="25.00", status="active")
+        cls.cart = Cart.objects.create(user=cls.student)
+
+    def fill_cart(self):
+        CartItem.objects.create(cart=self.cart, item=self.item, quantity=2)
+
+    def test_replayed_session_places_nothing(self):
+        self.fill_cart()
+        self.assertTrue(place_cart_orders(self.student.id, "cs_test_1", "Hall 3"))
+        self.fill_cart()
+        self.assertFalse(place_cart_orders(self.student.id, "cs_test_1", "Hall 3"))
+        self.assertEqual(ShopOrder.objects.count(), 1)
+        self.assertTrue(CartItem.objects.exists())
+
+    def test_concurrent_placement_counts_as_placed(self):
+        self.fill_cart()
+        place_cart_orders(self.student.id, "cs_test_1", "Hall 3")
+        self.fill_cart()
+        # The other request committed after this one checked for the session
+        with mock.patch.object(QuerySet, "exists", return_value=False):
+            self.assertFalse(place_cart_orders(self.student.id, "cs_test_1", "Hall 3"))
+        self.assertEqual(ShopOrder.objects.count(), 1)
+        self.assertTrue(CartItem.objects.exists())
+
+
+class DropReplayedOrdersMigrationTests(TransactionTestCase):
+    before = [("core", "0020_vendor_assignment")]
+    after = [("core", "0021_shoporder_session_item_unique")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_first_order_per_session_and_item_is_kept(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        User = apps.get_model("core", "CustomUser")
+        ShopItem = apps.get_model("core", "ShopItem")
+        ShopOrder = apps.get_model("core", "ShopOrder")
+        vendor = User.objects.create(username="migration_vendor", role="vendor")
+        buyer = User.objects.create(username="migration_buyer", role="student")
+        pen, pad = (ShopItem.objects.create(vendor=vendor, name=name, price=10) for name in ("Pen", "Pad"))
+        kept = [
+            ShopOrder.objects.create(buyer=buyer, item=pen, stripe_session_id="cs_test_1"),
+            ShopOrder.objects.create(buyer=buyer, item=pad, stripe_session_id="cs_test_1"),
+            ShopOrder.objects.create(buyer=buyer, item=pen, stripe_session_id="cs_test_2"),
+            # Unpaid orders have no session and are never duplicates
+            ShopOrder.objects.create(buyer=buyer, item=pen),
+            ShopOrder.objects.create(buyer=buyer, item=pen, stripe_session_id=""),
+        ]
+        for _ in range(2):
+            ShopOrder.objects.create(buyer=buyer, item=pen, stripe_session_id="cs_test_1")
+
+        migration = importlib.import_module("core.migrations.0021_shoporder_session_item_unique")
+        migration.drop_replayed_orders(apps, None)
+        self.assertQuerySetEqual(
+            ShopOrder.objects.order_by("id").values_list("id", flat=True), [order.id for order in kept]
+        )
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+
+
+class CatalogApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user("api_vendor", password="pw", role="vendor", is_approved=True)
+        cls.items = [
+            ShopItem.objects.create(vendor=cls.vendor, name=f"Pen {n}", price="25.00", status="active")
+            for n in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_matching_etag_is_answered_without_queries(self):
+        response = self.client.get(reverse("api_shop_items"))
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("api_shop_items"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_item_write_changes_the_etag(self):
+        etag = self.client.get(reverse("api_shop_items"))["ETag"]
+        self.items[0].name = "Pencil"
+        self.items[0].save()
+        response = self.client.get(reverse("api_shop_items"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("Pencil", [item["name"] for item in response.json()["results"]])
+
+    def test_selected_fields(self):
+        response = self.client.get(reverse("api_shop_item", args=[self.items[0].pk]), {"fields": "id, price"})
+        self.assertEqual(response.json(), {"id": self.items[0].pk, "price": "25.00"})
+        response = self.client.get(reverse("api_shop_items"), {"fields": "name,password"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Unknown fields: password"})
+
+    def test_pages_follow_the_cursor(self):
+        first = self.client.get(reverse("api_shop_items"), {"limit": 2, "fields": "id"}).json()
+        second = self.client.get(reverse("api_shop_items"), {
+            "limit": 2, "fields": "id", "cursor": first["next_cursor"],
+        }).json()
+        ids = [item["id"] for item in first["results"] + second["results"]]
+        self.assertCountEqual(ids, [item.pk for item in self.items])
+        self.assertIsNone(second["next_cursor"])
+
+    def test_invalid_parameters_are_rejected(self):
+        for params, error in [
+            ({"cursor": "not-a-cursor"}, "Invalid cursor"),
+            ({"limit": "0"}, f"limit must be between 1 and {settings.API_MAX_PAGE_SIZE}"),
+            ({"category": "pens"}, "Invalid category"),
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(reverse("api_shop_items"), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"error": error})
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user("search_vendor", password="pw", role="vendor", is_approved=True)
+        cls.seller = CustomUser.objects.create_user("search_seller", password="pw", role="student")
+
+    def shop_item(self, name, description="", status="active"):
+        return ShopItem.objects.create(
+            vendor=self.vendor, name=name, description=description, price="10.00", status=status
+        )
+
+    def student_item(self, name, status="active"):
+        return StudentListedShopItem.objects.create(
+            student_vendor=self.seller, name=name, price="10.00", status=status
+        )
+
+    def found(self, query, **kwargs):
+        return [item for _, item in search_listings(query, **kwargs)]
+
+    def test_index_follows_saves_and_deletes(self):
+        item = self.shop_item("Graph paper")
+        self.assertEqual(self.found("graph"), [item])
+        item.name = "Drawing pad"
+        item.save()
+        self.assertEqual(self.found("graph"), [])
+        self.assertEqual(self.found("draw"), [item])
+        item.delete()
+        self.assertEqual(self.found("draw"), [])
+
+    def test_only_active_listings_are_found(self):
+        active = self.student_item("Calculus notes")
+        self.shop_item("Calculus guide", status="inactive")
+        self.student_item("Calculus slides", status="inactive")
+        self.student_item("Calculus answers", status="rejected")
+        self.assertEqual(self.found("calculus"), [active])
+
+    def test_moderation_reindexes_listings(self):
+        approved, rejected = self.student_item("Physics notes", "inactive"), self.student_item("Physics lab", "inactive")
+        moderate_items(self.vendor, [approved.pk], "approve")
+        moderate_items(self.vendor, [rejected.pk], "reject")
+        self.assertEqual(self.found("physics"), [approved])
+
+    def test_kind_filter(self):
+        shop, student = self.shop_item("Marker"), self.student_item("Marker set")
+        self.assertEqual(self.found("marker", kind="shop"), [shop])
+        self.assertEqual(self.found("marker", kind="student"), [student])
+        self.assertCountEqual(self.found("marker"), [shop, student])
+
+    def test_name_matches_rank_first(self):
+        in_description = self.shop_item("Ruler", "Goes with any stapler")
+        in_name = self.shop_item("Stapler")
+        self.assertEqual(self.found("stapler"), [in_name, in_description])
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            ANONYMOUS: None,
+            "student": CustomUser.objects.create_user("catalog_student", password="pw", role="student"),
+            "vendor": CustomUser.objects.create_user("catalog_vendor", password="pw", role="vendor", is_approved=True),
+        }
+        cls.category = Category.objects.create(name="Stationery")
+
+    def setUp(self):
+        cache.clear()
+
+    def pages(self, page):
+        """GETs ``page`` once per role, warming each role's cached catalog."""
+        responses = {}
+        for role, user in self.users.items():
+            self.client.logout()
+            if user:
+                self.client.force_login(user)
+            responses[role] = self.client.get(reverse(page))
+        return responses
+
+    def student_item(self, role, name):
+        # Vendors' student shop lists the listings awaiting approval
+        return StudentListedShopItem.objects.create(
+            student_vendor=self.users["student"], category=self.category, name=name, price="10.00",
+            status="inactive" if role == "vendor" else "active",
+        )
+
+    def test_shop_item_writes_evict_every_role(self):
+        self.pages("shop")
+        item = ShopItem.objects.create(
+            vendor=self.users["vendor"], category=self.category, name="Stapler", price="10.00", status="active"
+        )
+        for role, response in self.pages("shop").items():
+            with self.subTest(role=role):
+                self.assertContains(response, "Stapler")
+        item.delete()
+        for role, response in self.pages("shop").items():
+            with self.subTest(role=role):
+                self.assertNotContains(response, "Stapler")
+
+    def test_student_item_writes_evict_every_role(self):
+        for role in self.users:
+            self.pages("studentshop")
+            item = self.student_item(role, f"Notes for {role}")
+            with self.subTest(role=role):
+                self.assertContains(self.pages("studentshop")[role], f"Notes for {role}")
+                item.delete()
+                self.assertNotContains(self.pages("studentshop")[role], f"Notes for {role}")
+
+    def test_category_writes_evict_every_role(self):
+        ShopItem.objects.create(
+            vendor=self.users["vendor"], category=self.category, name="Stapler", price="10.00", status="active"
+        )
+        for role in self.users:
+            self.student_item(role, f"Notes for {role}")
+        self.pages("shop")
+        self.pages("studentshop")
+        self.category.name = "Office supplies"
+        self.category.save()
+        for page in ("shop", "studentshop"):
+            for role, response in self.pages(page).items():
+                with self.subTest(page=page, role=role):
+                    self.assertContains(response, "Office supplies")
+        self.category.delete()
+        for role, response in self.pages("shop").items():
+            with self.subTest(role=role):
+                self.assertNotContains(response, "Stapler")
+        for role, response in self.pages("studentshop").items():
+            with self.subTest(role=role):
+                self.assertNotContains(response, f"Notes for {role}")
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False, IMAGE_DERIVATIVE_WIDTHS=(32, 64))
+class ImageDerivativeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user("image_vendor", password="pw", role="vendor", is_approved=True)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.derivatives_dir = Path(media_root) / "derivatives"
+
+    def image(self, color):
+        buffer = BytesIO()
+        Image.new("RGB", (100, 50), color).save(buffer, "PNG")
+        return ContentFile(buffer.getvalue(), name=f"{color}.png")
+
+    def assertFilesMatchRows(self, count):
+        names = sorted(ImageDerivative.objects.values_list("image", flat=True))
+        self.assertEqual(len(names), count)
+        files = sorted(f"derivatives/{path.name}" for path in self.derivatives_dir.glob("*"))
+        self.assertEqual(files, names)
+
+    def test_repeated_saves_build_once(self):
+        with mock.patch.object(ImageOps, "exif_transpose", wraps=ImageOps.exif_transpose) as decoded:
+            with self.captureOnCommitCallbacks(execute=True):
+                item = ShopItem.objects.create(vendor=self.vendor, name="Pen", price="10.00", image=self.image("red"))
+                item.save()
+        self.assertEqual(decoded.call_count, 1)
+        self.assertFilesMatchRows(4)
+
+    def test_build_that_lost_the_race_keeps_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = ShopItem.objects.create(vendor=self.vendor, name="Pen", price="10.00", image=self.image("red"))
+        content_type = ContentType.objects.get_for_model(item)
+        # Past the first check, but another build commits before this one does
+        with mock.patch.object(images, "_has_derivatives", side_effect=[False, True]):
+            images.build_derivatives(content_type.pk, item.pk, item.image.name)
+        self.assertFilesMatchRows(4)
+
+    def test_replaced_image_drops_old_files(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = ShopItem.objects.create(vendor=self.vendor, name="Pen", price="10.00", image=self.image("red"))
+        with self.captureOnCommitCallbacks(execute=True):
+            item.image = self.image("blue")
+            item.save()
+        self.assertFilesMatchRows(4)
+        self.assertEqual(set(item.derivatives.values_list("source", flat=True)), {item.image.name})
+
+    def test_deleted_item_drops_its_files(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = ShopItem.objects.create(vendor=self.vendor, name="Pen", price="10.00", image=self.image("red"))
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertFilesMatchRows(0)
+
+
+class RunAfterCommitTests(TestCase):
+    def run_failing(self, **settings):
+        failing = mock.Mock(side_effect=RuntimeError("boom"), __qualname__="failing")
+        with override_settings(**settings), self.captureOnCommitCallbacks(execute=True):
+            run_after_commit(failing, 1, async_setting="BACKGROUND_TEST_ASYNC", pool="background-test")
+            failing.assert_not_called()
+        return failing
+
+    def test_background_failures_are_logged(self):
+        with self.assertLogs("core.background", "ERROR") as logs:
+            failing = self.run_failing(BACKGROUND_TEST_ASYNC=True)
+            # The pool has one thread, so this waits for the failing call
+            executor("background-test").submit(lambda: None).result()
+        failing.assert_called_once_with(1)
+        self.assertIn("Background failing(1,) failed", logs.output[0])
+
+    def test_inline_failures_propagate(self):
+        with self.assertRaises(RuntimeError):
+            self.run_failing(BACKGROUND_TEST_ASYNC=False)
@@ -0,0 +1,49 @@
+"""
+Upload handling for multipart request bodies.
+
+Django parses the body the first time ``request.POST`` or ``request.FILES``
+is read, which CsrfViewMiddleware does before any view runs, so the size
+cap has to be enforced here rather than in a view or form.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+
+# Room for the form fields and multipart boundaries around the largest file
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Spools uploads to a temporary file like Django's handler, hashing each
+    chunk as it arrives (``file.sha256``, which ContentAddressedStorage then
+    names the file by) and giving up as soon as the request or a file is
+    larger than MAX_DOCUMENT_UPLOAD_SIZE, without reading the rest of the
+    body. Refused requests get ``request.upload_too_large``.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request_too_large = content_length > settings.MAX_DOCUMENT_UPLOAD_SIZE + MULTIPART_OVERHEAD
+        return super().handle_raw_input(input_data, META, content_length, boundary, encoding)
+
+    def new_file(self, *args, **kwargs):
+        if self.request_too_large:
+            self.refuse()
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.MAX_DOCUMENT_UPLOAD_SIZE:
+            self.refuse()
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.sha256.hexdigest()
+        return file
+
+    def refuse(self):
+        self.request.upload_too_large = True
+        raise StopUpload(connection_reset=True)
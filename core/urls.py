@@ -1,5 +1,6 @@
 from django.urls import path
 from core.views import *
+from core import api
 from django.contrib.auth.views import LogoutView
 
 
@@ -20,15 +21,20 @@ urlpatterns = [
     path('orders/student/', student_orders, name='student_orders'),
     # path('orders/vendor/', vendor_orders, name='vendor_orders'),
     path('orders/vendor/update/<int:order_id>/', update_order, name='update_order'),
+    path('orders/<int:order_id>/document/', download_order_document, name='download_order_document'),
     path('custom-admin/approve-vendors/', admin_approve_vendors, name='admin_approve_vendors'),
 
     path('shop/', shop_view, name='shop'),
+    path('shop/items/', shop_items, name='shop_items'),
     path('student-shop/', student_shop_view, name='studentshop'),
+    path('search/', search, name='search'),
     path("student-store/add/", student_add_item, name="student_add_item"),
 
     path('order-item/<int:item_id>/', order_item, name='order_item'),
     path('vendor-orders/', vendor_orders, name='vendor_orders'),
+    path('vendor-orders/bulk-status/', bulk_update_order_status, name='bulk_update_order_status'),
     path('student-vendor-orders/', student_shop_orders, name='student_vendor_orders'),
+    path('student-vendor-orders/bulk-status/', bulk_update_student_order_status, name='bulk_update_student_order_status'),
     path("my-orders/", student_orders, name="student_orders"),
     path('update-order-status/<str:order_type>/<int:order_id>', update_order_status, name='update_order_status'),
     path('update-student-order-status/<str:order_type>/<int:order_id>', update_student_order_status, name='update_student_order_status'),
@@ -46,6 +52,8 @@ urlpatterns = [
 
 
     path("approve-item/<int:item_id>/", approve_student_item, name="approve_student_item"),
+    path("moderation/", moderation_queue, name="moderation_queue"),
+    path("moderation/decide/", moderate_student_items, name="moderate_student_items"),
     path('order/<int:order_id>/delivery/', delivery_details_view, name='delivery_details'),
 
 
@@ -53,7 +61,7 @@ urlpatterns = [
     path('payment-success/', payment_success, name='payment_success'),
     path('payment-cancel/', payment_cancel, name='payment_cancel'),
 
-    # path('stripe/webhook/', stripe_webhook, name='stripe_webhook'),
+    path('stripe/webhook/', stripe_webhook, name='stripe_webhook'),
 
     path('cart/', view_cart, name='view_cart'),
     path('cart/add/<int:item_id>/', add_to_cart, name='add_to_cart'),
@@ -62,4 +70,10 @@ urlpatterns = [
 
     path('create-cart-checkout-session/', create_cart_checkout_session, name='create_cart_checkout_session'),
 
+    path('api/v1/categories/', api.categories, name='api_categories'),
+    path('api/v1/shop-items/', api.shop_items, name='api_shop_items'),
+    path('api/v1/shop-items/<int:item_id>/', api.shop_item, name='api_shop_item'),
+    path('api/v1/student-items/', api.student_items, name='api_student_items'),
+    path('api/v1/student-items/<int:item_id>/', api.student_item, name='api_student_item'),
+
 ]
@@ -0,0 +1,72 @@
+"""Approving and rejecting vendor sign-ups in bulk."""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .assignment import invalidate_vendor_rotation
+from .background import run_after_commit
+from .counters import refresh_order_counters
+from .models import CustomUser
+
+
+def pending_vendors():
+    """Vendor accounts waiting for an admin's decision."""
+    return CustomUser.objects.filter(role="vendor", is_approved=False, is_active=True, rejected_at__isnull=True)
+
+
+def rejected_vendors():
+    """Vendor accounts rejected by an admin whose deletion hasn't run yet."""
+    return CustomUser.objects.filter(role="vendor", rejected_at__isnull=False)
+
+
+def approve_vendors(vendor_ids):
+    """Approves the pending vendors in ``vendor_ids`` with one UPDATE. Returns their ids."""
+    with transaction.atomic():
+        approved = list(pending_vendors().select_for_update().filter(id__in=vendor_ids).values_list("id", flat=True))
+        if approved:
+            CustomUser.objects.filter(id__in=approved).update(is_approved=True)
+            # update() skips the CustomUser signals that make vendors assignable
+            refresh_order_counters(approved)
+            transaction.on_commit(invalidate_vendor_rotation)
+    return approved
+
+
+def reject_vendors(vendor_ids):
+    """
+    Marks the pending vendors in ``vendor_ids`` rejected and deactivates
+    them with one UPDATE, which locks them out at once, and schedules the
+    cascading delete of their accounts. Returns their ids.
+    """
+    with transaction.atomic():
+        rejected = list(pending_vendors().select_for_update().filter(id__in=vendor_ids).values_list("id", flat=True))
+        if rejected:
+            CustomUser.objects.filter(id__in=rejected).update(is_active=False, rejected_at=timezone.now())
+            schedule_vendor_deletion(rejected)
+    return rejected
+
+
+def schedule_vendor_deletion(vendor_ids):
+    """Deletes the rejected vendors on a worker thread once the rejection is committed."""
+    run_after_commit(
+        delete_rejected_vendors, vendor_ids, async_setting="VENDOR_DELETES_ASYNC", pool="vendor-deletes"
+    )
+
+
+def delete_rejected_vendors(vendor_ids=None):
+    """
+    Deletes the accounts of rejected vendors (all of them when
+    ``vendor_ids`` is None) ``VENDOR_DELETE_BATCH_SIZE`` at a time, each batch's cascade in its
+    own transaction so no single delete holds the database for long.
+    Returns how many accounts were deleted.
+    """
+    accounts = rejected_vendors().order_by("id")
+    if vendor_ids is not None:
+        accounts = accounts.filter(id__in=vendor_ids)
+    deleted = 0
+    while True:
+        batch = list(accounts.values_list("id", flat=True)[:settings.VENDOR_DELETE_BATCH_SIZE])
+        if not batch:
+            return deleted
+        with transaction.atomic():
+            CustomUser.objects.filter(id__in=batch).delete()
+        deleted += len(batch)
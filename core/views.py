@@ -1,38 +1,76 @@
-from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
-from django.shortcuts import render, redirect,get_object_or_404
+import posixpath
+from datetime import date, datetime, timedelta
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import render, redirect,get_object_or_404, aget_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from .forms import *
 from .models import *
 from django.contrib.auth.views import LoginView
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.db.models import Prefetch
 import stripe
 from django.conf import settings
-from django.db.models import Prefetch, F, Sum
+from django.db.models import Count, Prefetch, F, Sum, Value
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
+from .cart import evict_cart_count, increment_cart_count, read_cart
+from .catalog import cached_catalog, catalog_role
+from .counters import get_order_counts
+from .moderation import DECISIONS, claim_items, moderate_items, pending_items, release_items
+from .downloads import serve_file
+from .orders import ALLOWED_TRANSITIONS, bulk_transition, vendor_orders_queryset, vendor_print_queue, visible_print_orders
+from .page_cache import cache_policy, catalog_version, deploy_version
+from .pagination import keyset_page
+from .payments import create_checkout_session as create_stripe_session, retrieve_checkout_session
+from .preflight import schedule_preflight
+from .search import search_listings
+from .vendors import approve_vendors, pending_vendors, reject_vendors
+from .webhooks import fulfil_checkout_session, record_event
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+def _check_user(view_func, reject):
+    """Wraps a sync or async view so ``reject(user)`` can answer instead of it."""
+    if iscoroutinefunction(view_func):
+        async def wrapper(request, *args, **kwargs):
+            response = reject(await request.auser())
+            if response is not None:
+                return response
+            return await view_func(request, *args, **kwargs)
+    else:
+        def wrapper(request, *args, **kwargs):
+            response = reject(request.user)
+            if response is not None:
+                return response
+            return view_func(request, *args, **kwargs)
+    return wraps(view_func)(wrapper)
+
 def vendor_required(view_func):
     """Decorator to ensure only approved vendors can access"""
-    def wrapper(request, *args, **kwargs):
-        if not request.user.is_authenticated:
+    def reject(user):
+        if not user.is_authenticated:
             return redirect("login")
-        if request.user.role != "vendor" or not request.user.is_approved:
+        if user.role != "vendor" or not user.is_approved:
             return HttpResponseForbidden("You are not authorized to access this page.")
-        return view_func(request, *args, **kwargs)
-    return wrapper
+    return _check_user(view_func, reject)
 
 def student_required(view_func):
     """Decorator to ensure only approved vendors can access"""
-    def wrapper(request, *args, **kwargs):
-        if not request.user.is_authenticated:
+    def reject(user):
+        if not user.is_authenticated:
             return redirect("login")
-        if request.user.role != "student":
+        if user.role != "student":
             return HttpResponseForbidden("You are not authorized to access this page.")
-        return view_func(request, *args, **kwargs)
-    return wrapper
+    return _check_user(view_func, reject)
 
 
 class CustomLoginView(LoginView):
@@ -63,51 +101,54 @@ def contact(request):
     return render(request, "core/contact.html")
 
 
-def about(request):
-    team_members = [
-        {
-            "name": "Md Muntasir Rahman",
-            "id": "011211137",
-            "image": "images/team/Md Muntasir Rahman ID-011211137.jpg"
-        },
-        {
-            "name": "Shahin Shikder Dipu",
-            "id": "011202095",
-            "image": "images/team/Name-Shahin Shikder Dipu  ID-011202095.jpg"
-        },
-        {
-            "name": "Riad Hasan",
-            "id": "011202290",
-            "image": "images/team/Riad Hasan ID-011202290.jpg"
-        }
-    ]
-    return render(request, "core/about.html", {"team_members": team_members})
+TEAM_MEMBERS = [
+    {
+        "name": "Md Muntasir Rahman",
+        "id": "011211137",
+        "image": "images/team/Md Muntasir Rahman ID-011211137.jpg"
+    },
+    {
+        "name": "Shahin Shikder Dipu",
+        "id": "011202095",
+        "image": "images/team/Name-Shahin Shikder Dipu  ID-011202095.jpg"
+    },
+    {
+        "name": "Riad Hasan",
+        "id": "011202290",
+        "image": "images/team/Riad Hasan ID-011202290.jpg"
+    }
+]
 
+@cache_policy(deploy_version, max_age=settings.PUBLIC_PAGE_MAX_AGE, precompute=True)
+def about(request):
+    return render(request, "core/about.html", {"team_members": TEAM_MEMBERS})
+
+HOME_FEATURES = [
+    {
+        "title": "Fast Printing",
+        "description": "Get your documents printed quickly with same-day service.",
+        "icon": "bi-speedometer2"
+    },
+    {
+        "title": "High Quality",
+        "description": "Professional quality prints with vibrant colors and sharp text.",
+        "icon": "bi-brush"
+    },
+    {
+        "title": "Affordable Prices",
+        "description": "Competitive pricing for students and businesses alike.",
+        "icon": "bi-cash-stack"
+    },
+    {
+        "title": "Secure Handling",
+        "description": "Your documents are handled safely and confidentially.",
+        "icon": "bi-shield-lock"
+    },
+]
+
+@cache_policy(deploy_version, max_age=settings.PUBLIC_PAGE_MAX_AGE, precompute=True)
 def home(request):
-    
-    features = [
-        {
-            "title": "Fast Printing",
-            "description": "Get your documents printed quickly with same-day service.",
-            "icon": "bi-speedometer2"
-        },
-        {
-            "title": "High Quality",
-            "description": "Professional quality prints with vibrant colors and sharp text.",
-            "icon": "bi-brush"
-        },
-        {
-            "title": "Affordable Prices",
-            "description": "Competitive pricing for students and businesses alike.",
-            "icon": "bi-cash-stack"
-        },
-        {
-            "title": "Secure Handling",
-            "description": "Your documents are handled safely and confidentially.",
-            "icon": "bi-shield-lock"
-        },
-    ]
-    return render(request, "core/home.html", {"features": features})
+    return render(request, "core/home.html", {"features": HOME_FEATURES})
 
 
 
@@ -153,14 +194,14 @@ def student_dashboard(request):
     if request.user.role != "student":
         return redirect("vendor_dashboard")
 
-    total_orders = request.user.orders.count()
-    in_progress = request.user.orders.filter(status="in_progress").count()
-    completed = request.user.orders.filter(status="done").count()
+    counts = get_order_counts(request.user)
+    recent_orders = request.user.orders.select_related("vendor").order_by("-created_at")[:5]
 
     return render(request, "student_dashboard.html", {
-        "total_orders": total_orders,
-        "in_progress": in_progress,
-        "completed": completed,
+        "total_orders": counts.total,
+        "in_progress": counts.in_progress,
+        "completed": counts.done,
+        "recent_orders": recent_orders,
     })
 
 
@@ -169,14 +210,14 @@ def vendor_dashboard(request):
     if request.user.role != "vendor":
         return redirect("student_dashboard")
 
-    total_orders = request.user.vendor_orders.count()
-    in_progress = request.user.vendor_orders.filter(status="in_progress").count()
-    completed = request.user.vendor_orders.filter(status="done").count()
+    counts = get_order_counts(request.user)
+    recent_orders = request.user.vendor_orders.select_related("student").order_by("-created_at")[:5]
 
     return render(request, "vendor_dashboard.html", {
-        "total_orders": total_orders,
-        "in_progress": in_progress,
-        "completed": completed,
+        "total_orders": counts.total,
+        "in_progress": counts.in_progress,
+        "completed": counts.done,
+        "recent_orders": recent_orders,
     })
 
 
@@ -193,15 +234,25 @@ def create_order(request):
         return redirect('vendor_dashboard')
 
     if request.method == 'POST':
+        try:
+            int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return HttpResponse("Invalid Content-Length", status=400)
         form = OrderForm(request.POST, request.FILES)
+        # The upload handler stopped reading an oversized body (core.uploads)
+        if getattr(request, 'upload_too_large', False):
+            return HttpResponse("Document too large", status=413)
+
         if form.is_valid():
             order = form.save(commit=False)
             order.student = request.user
+            order.document_name = form.cleaned_data['document'].name
             if not order.vendor:
                 order.save() 
-                order.assign_random_vendor()
+                order.assign_vendor()
             else:
                 order.save()
+            schedule_preflight(order)
             return redirect('student_orders')
     else:
         form = OrderForm()
@@ -262,29 +313,53 @@ def update_order(request, order_id):
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
 def admin_approve_vendors(request):
-    # Get vendors waiting for approval
-    pending_vendors = CustomUser.objects.filter(role='vendor', is_approved=False)
-
+    """
+    Vendors waiting for approval, oldest first, ``VENDOR_APPROVAL_PAGE_SIZE``
+    at a time. POSTs approve or reject every selected ``vendor_id`` at once.
+    """
     if request.method == "POST":
-        vendor_id = request.POST.get("vendor_id")
         action = request.POST.get("action")
+        try:
+            vendor_ids = list(dict.fromkeys(int(vendor_id) for vendor_id in request.POST.getlist("vendor_id")))
+        except ValueError:
+            vendor_ids = []
+        if action not in ("approve", "reject") or not vendor_ids:
+            messages.error(request, "Select some vendors and an action.")
+        elif action == "approve":
+            approved = approve_vendors(vendor_ids)
+            messages.success(request, f"Approved {len(approved)} vendor{'s' if len(approved) != 1 else ''}.")
+        else:
+            rejected = reject_vendors(vendor_ids)
+            messages.success(request, f"Rejected {len(rejected)} vendor{'s' if len(rejected) != 1 else ''}.")
 
-        vendor = CustomUser.objects.get(id=vendor_id)
-        if action == "approve":
-            vendor.is_approved = True
-            vendor.save()
-        elif action == "reject":
-            vendor.delete()
-
+        next_url = request.POST.get("next")
+        if url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+            return redirect(next_url)
         return redirect('admin_approve_vendors')
 
-    return render(request, 'core/admin_approve_vendors.html', {'pending_vendors': pending_vendors})
+    # Keyset pages on id: decided vendors drop out without shifting later pages
+    vendors = pending_vendors().order_by("id")
+    after = request.GET.get("after", "")
+    if after:
+        if not after.isdigit():
+            return HttpResponse("Invalid page", status=400)
+        vendors = vendors.filter(id__gt=int(after))
+    page_size = settings.VENDOR_APPROVAL_PAGE_SIZE
+    pending_page = list(vendors.only("id", "username", "email", "date_joined")[:page_size + 1])
+    next_after = pending_page[page_size - 1].pk if len(pending_page) > page_size else None
+
+    return render(request, 'core/admin_approve_vendors.html', {
+        'pending_vendors': pending_page[:page_size],
+        'pending_count': pending_vendors().count(),
+        'next_after': next_after,
+        'paged': bool(after),
+    })
 
 
 @login_required
 @vendor_required
 def my_store(request):
-    items = ShopItem.objects.filter(vendor=request.user)
+    items = ShopItem.objects.filter(vendor=request.user).prefetch_related("derivatives")
     return render(request, "store/my_store.html", {"items": items})
 
 @login_required
@@ -367,52 +442,166 @@ def toggle_item_status(request, item_id):
     return redirect("my_store")
 
 
+@cache_policy(catalog_version, max_age=settings.PUBLIC_CATALOG_MAX_AGE)
 def shop_view(request):
-    categories = Category.objects.prefetch_related("items").all()
+    categories = cached_catalog(
+        "shop",
+        catalog_role(request.user),
+        lambda: list(Category.objects.prefetch_related(
+            Prefetch("items", queryset=ShopItem.objects.filter(status="active").prefetch_related("derivatives"))
+        )),
+    )
     return render(request, "store/shop.html", {"categories": categories})
 
+def shop_items(request):
+    """Active shop items newest first, one keyset page at a time."""
+    items = ShopItem.objects.filter(status="active").prefetch_related("derivatives")
+    category_id = request.GET.get("category")
+    if category_id:
+        try:
+            category_id = int(category_id)
+        except ValueError:
+            return HttpResponse("Invalid category", status=400)
+        items = items.filter(category_id=category_id)
+
+    cursor = request.GET.get("cursor")
+    try:
+        page, next_cursor = keyset_page(items, cursor, settings.SHOP_PAGE_SIZE)
+    except ValueError:
+        return HttpResponse("Invalid cursor", status=400)
+
+    context = {
+        "items": page,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+        "category_id": category_id,
+    }
+
+    # "Load more" only needs the next batch of cards
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return render(request, "store/shop_items_fragment.html", context)
+
+    context["categories"] = Category.objects.all()
+    return render(request, "store/shop_items.html", context)
+
+@cache_policy(catalog_version, max_age=settings.PUBLIC_CATALOG_MAX_AGE)
 def student_shop_view(request):
-    if not request.user.is_authenticated:
+    role = catalog_role(request.user)
+    if role == "vendor":
+        # Vendors see inactive student items
         student_items_prefetch = Prefetch(
             "student_items",
-            queryset=StudentListedShopItem.objects.filter(status="active").select_related("student_vendor", "approved_by")
+            queryset=StudentListedShopItem.objects.filter(status="inactive").select_related("student_vendor").prefetch_related("derivatives")
         )
     else:
-        # active_items = Prefetch(
-        #     "student_items",
-        #     queryset=StudentListedShopItem.objects.filter(status="active").select_related("student_vendor", "approved_by")
-        # )
-        # categories = Category.objects.prefetch_related(active_items)
-        # return render(request, "store/student_shop.html", {"categories": categories})
-
-        if request.user.role == "vendor":
-            # Vendors see inactive student items
-            student_items_prefetch = Prefetch(
-                "student_items",
-                queryset=StudentListedShopItem.objects.filter(status="inactive").select_related("student_vendor")
-            )
-        else:
-            # Students see only active items
-            student_items_prefetch = Prefetch(
-                "student_items",
-                queryset=StudentListedShopItem.objects.filter(status="active").select_related("student_vendor", "approved_by")
-            )
+        # Students and visitors see only active items
+        student_items_prefetch = Prefetch(
+            "student_items",
+            queryset=StudentListedShopItem.objects.filter(status="active").select_related("student_vendor", "approved_by").prefetch_related("derivatives")
+        )
 
-    categories = Category.objects.prefetch_related(student_items_prefetch)
+    categories = cached_catalog(
+        "student_shop",
+        role,
+        lambda: list(Category.objects.prefetch_related(student_items_prefetch)),
+    )
     return render(request, "store/student_shop.html", {"categories": categories})
 
+def search(request):
+    query = request.GET.get("q", "").strip()
+    kind = request.GET.get("kind", "")
+    results = search_listings(query, kind=kind or None, limit=settings.SEARCH_RESULTS_LIMIT)
+    return render(request, "store/search_results.html", {
+        "query": query,
+        "kind": kind,
+        "results": results,
+    })
+
 @login_required
+@require_POST
 def approve_student_item(request, item_id):
     if request.user.role != "vendor":
         return redirect("studentshop")
 
-    item = get_object_or_404(StudentListedShopItem, id=item_id)
-    item.status = "active"
-    item.approved_by = request.user
-    item.save()
+    result = moderate_items(request.user, [item_id], "approve")[item_id]
+    if result == "claimed":
+        messages.warning(request, "Another vendor is reviewing this item.")
+    elif result == "not_pending":
+        get_object_or_404(StudentListedShopItem, id=item_id)
 
     return redirect("studentshop")
 
+@login_required
+@vendor_required
+def moderation_queue(request):
+    """
+    Student listings waiting for approval, newest first and keyset-paginated,
+    with the total still pending and who has claimed each one.
+    """
+    try:
+        items, next_cursor = keyset_page(
+            pending_items().select_related("student_vendor", "category", "claimed_by"),
+            request.GET.get("cursor"),
+            settings.MODERATION_PAGE_SIZE,
+        )
+    except ValueError:
+        return HttpResponse("Invalid cursor", status=400)
+
+    claim_expired = timezone.now() - timedelta(minutes=settings.MODERATION_CLAIM_MINUTES)
+    for item in items:
+        item.claimed_by_other = (
+            item.claimed_by_id not in (None, request.user.pk) and item.claimed_at >= claim_expired
+        )
+
+    return render(request, "store/moderation_queue.html", {
+        "items": items,
+        "pending_count": pending_items().count(),
+        "next_cursor": next_cursor,
+        "paged": "cursor" in request.GET,
+    })
+
+@login_required
+@vendor_required
+@require_POST
+def moderate_student_items(request):
+    """
+    Approves, rejects, claims or releases the selected listings (``ids``)
+    from the moderation queue in one go.
+    """
+    next_url = request.POST.get("next")
+    if not url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+        next_url = reverse("moderation_queue")
+
+    action = request.POST.get("action")
+    try:
+        item_ids = list(dict.fromkeys(int(item_id) for item_id in request.POST.getlist("ids")))
+    except ValueError:
+        item_ids = []
+    if action not in {*DECISIONS, "claim", "release"} or not item_ids:
+        messages.error(request, "Select some items and an action.")
+        return redirect(next_url)
+    if len(item_ids) > settings.MODERATION_MAX_ITEMS:
+        messages.error(request, f"Moderate at most {settings.MODERATION_MAX_ITEMS} items at a time.")
+        return redirect(next_url)
+
+    if action == "claim":
+        claimed = claim_items(request.user, item_ids)
+        messages.success(request, f"Claimed {claimed} item{'s' if claimed != 1 else ''}.")
+    elif action == "release":
+        released = release_items(request.user, item_ids)
+        messages.success(request, f"Released {released} item{'s' if released != 1 else ''}.")
+    else:
+        results = moderate_items(request.user, item_ids, action)
+        done = sum(result == DECISIONS[action][1] for result in results.values())
+        messages.success(request, f"{DECISIONS[action][1].capitalize()} {done} item{'s' if done != 1 else ''}.")
+        if done < len(item_ids):
+            skipped = len(item_ids) - done
+            messages.warning(
+                request,
+                f"{skipped} item{'s were' if skipped != 1 else ' was'} already decided or claimed by another vendor.",
+            )
+    return redirect(next_url)
+
 
 
 # @login_required
@@ -450,69 +639,275 @@ def order_item(request, item_id):
 
 
 
+def _created_range(request):
+    """
+    The ``created_at`` filter for the ``from`` and ``to`` (YYYY-MM-DD, both
+    inclusive) query parameters. Raises ValueError on a malformed date.
+    """
+    bounds = {}
+    if request.GET.get("from"):
+        start = date.fromisoformat(request.GET["from"])
+        bounds["created_at__gte"] = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+    if request.GET.get("to"):
+        end = date.fromisoformat(request.GET["to"]) + timedelta(days=1)
+        bounds["created_at__lt"] = timezone.make_aware(datetime.combine(end, datetime.min.time()))
+    return bounds
+
+def _print_order_json(order):
+    return {
+        "id": order.id,
+        "student": order.student.username,
+        "vendor_id": order.vendor_id,
+        "document_name": order.document_name,
+        "document_url": reverse("download_order_document", args=[order.id]),
+        "status": order.status,
+        "preflight_status": order.preflight_status,
+        "page_count": order.page_count,
+        "quote": str(order.quote) if order.quote is not None else None,
+        "created_at": order.created_at.isoformat(),
+    }
+
+def _shop_order_json(order):
+    return {
+        "id": order.id,
+        "buyer": order.buyer.username,
+        "item_id": order.item_id,
+        "item": order.item.name,
+        "quantity": order.quantity,
+        "status": order.status,
+        "payment_status": order.payment_status,
+        "created_at": order.created_at.isoformat(),
+    }
+
 @login_required
 def vendor_orders(request):
+    """
+    The vendor's work queue: print orders (theirs and unclaimed pending ones)
+    and orders for their shop items, each keyset-paginated, with optional
+    status and date filters and per-status counts. ``?format=json`` returns
+    the same page as JSON.
+    """
     if request.user.role != 'vendor':
         return redirect('student_orders')
 
-    print_orders = Order.objects.filter(
-        models.Q(vendor=request.user) | models.Q(vendor__isnull=True, status='pending')
-    ).order_by('-created_at')
+    try:
+        created = _created_range(request)
+    except ValueError:
+        return HttpResponse("Invalid date", status=400)
+
+    print_orders = vendor_print_queue(request.user).filter(**created)
+    shop_orders = vendor_orders_queryset(request.user, "shop").filter(**created)
+
+    # Per-status counts of both sections in one grouped query
+    status_counts = {"print": {}, "shop": {}}
+    grouped = print_orders.annotate(kind=Value("print")).values_list("kind", "status").annotate(
+        n=Count("id")
+    ).order_by().union(
+        shop_orders.annotate(kind=Value("shop")).values_list("kind", "status").annotate(
+            n=Count("id")
+        ).order_by(),
+        all=True,
+    )
+    for kind, status, n in grouped:
+        status_counts[kind][status] = n
 
-    shop_orders = ShopOrder.objects.filter(item__vendor=request.user).select_related("item", "buyer")
+    status = request.GET.get("status", "")
+    if status:
+        print_orders = print_orders.filter(status=status)
+        shop_orders = shop_orders.filter(status=status)
+
+    try:
+        print_page, print_next = keyset_page(
+            print_orders.select_related("student"), request.GET.get("print_cursor"),
+            settings.VENDOR_ORDERS_PAGE_SIZE,
+        )
+        shop_page, shop_next = keyset_page(
+            shop_orders.select_related("item", "buyer"), request.GET.get("shop_cursor"),
+            settings.VENDOR_ORDERS_PAGE_SIZE,
+        )
+    except ValueError:
+        return HttpResponse("Invalid cursor", status=400)
+
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "status_counts": status_counts,
+            "print_orders": {
+                "results": [_print_order_json(order) for order in print_page],
+                "next_cursor": print_next,
+            },
+            "shop_orders": {
+                "results": [_shop_order_json(order) for order in shop_page],
+                "next_cursor": shop_next,
+            },
+        })
+
+    # Links to the next page of one section keep the filters and the other section's page
+    params = request.GET.copy()
+    params.pop("format", None)
+    next_links = {}
+    for section, next_cursor in (("print_cursor", print_next), ("shop_cursor", shop_next)):
+        if next_cursor:
+            link = params.copy()
+            link[section] = next_cursor
+            next_links[section] = link.urlencode()
+    filters = request.GET.copy()
+    for section in ("print_cursor", "shop_cursor"):
+        filters.pop(section, None)
 
     return render(request, 'store/vendor_orders2.html', {
-        'print_orders': print_orders,
-        'shop_orders': shop_orders,
+        'print_orders': print_page,
+        'shop_orders': shop_page,
+        'print_counts': [(label, status_counts["print"].get(key, 0)) for key, label in Order.STATUS_CHOICES],
+        'shop_counts': [(label, status_counts["shop"].get(key, 0)) for key, label in ShopOrder.STATUS_CHOICES],
+        'print_status_choices': Order.STATUS_CHOICES,
+        'shop_status_choices': ShopOrder.STATUS_CHOICES,
+        'status_filter': status,
+        'date_from': request.GET.get("from", ""),
+        'date_to': request.GET.get("to", ""),
+        'print_next': next_links.get("print_cursor"),
+        'shop_next': next_links.get("shop_cursor"),
+        'paged': "print_cursor" in request.GET or "shop_cursor" in request.GET,
+        'filter_query': filters.urlencode(),
     })
 
+def _bulk_status_response(request, order_types, queue):
+    """
+    Moves the selected orders (``ids``) of one of ``order_types`` to one
+    ``status``. AJAX requests get the per-order results as JSON; form posts
+    get a summary message and go back to the ``queue`` page.
+    """
+    is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    next_url = request.POST.get("next")
+    if not url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+        next_url = reverse(queue)
+
+    def bad_request(message):
+        if is_ajax:
+            return JsonResponse({"error": message}, status=400)
+        messages.error(request, message)
+        return redirect(next_url)
+
+    order_type = request.POST.get("order_type")
+    status = request.POST.get("status")
+    if order_type not in order_types or status not in ALLOWED_TRANSITIONS[order_type]:
+        return bad_request("Unknown order type or status.")
+    try:
+        order_ids = list(dict.fromkeys(int(order_id) for order_id in request.POST.getlist("ids")))
+    except ValueError:
+        return bad_request("Invalid order id.")
+    if not order_ids:
+        return bad_request("Select at least one order.")
+    if len(order_ids) > settings.BULK_STATUS_MAX_ORDERS:
+        return bad_request(f"Update at most {settings.BULK_STATUS_MAX_ORDERS} orders at a time.")
+
+    results = bulk_transition(request.user, order_type, order_ids, status)
+
+    if is_ajax:
+        return JsonResponse({
+            "order_type": order_type,
+            "status": status,
+            "results": {str(order_id): result for order_id, result in results.items()},
+        })
+
+    updated = sum(result == "updated" for result in results.values())
+    skipped = len(results) - updated - sum(result == "unchanged" for result in results.values())
+    messages.success(request, f"Updated {updated} order{'s' if updated != 1 else ''}.")
+    if skipped:
+        messages.warning(request, f"{skipped} order{'s' if skipped != 1 else ''} could not move to that status.")
+    return redirect(next_url)
+
+
+@login_required
+@vendor_required
+@require_POST
+def bulk_update_order_status(request):
+    """Moves the vendor's selected print or shop orders to one status."""
+    return _bulk_status_response(request, ("print", "shop"), "vendor_orders")
+
+
+@login_required
+@student_required
+@require_POST
+def bulk_update_student_order_status(request):
+    """Moves the selected orders for the student's own listings to one status."""
+    return _bulk_status_response(request, ("student",), "student_vendor_orders")
+
+@login_required
+def download_order_document(request, order_id):
+    """
+    The document of a print order, for its student or vendor (and approved
+    vendors while it is unclaimed), saved under the name it was uploaded as.
+    Supports Range/If-Range so large handouts can be resumed.
+    """
+    order = get_object_or_404(visible_print_orders(request.user).only("document", "document_name"), id=order_id)
+    if not order.document:
+        raise Http404("This order has no document")
+    return serve_file(
+        request, order.document.storage, order.document.name,
+        filename=order.document_name or None, as_attachment="download" in request.GET, private=True,
+    )
+
+# Media under these prefixes belongs to print orders and is only sent to
+# the people working on the order.
+PRIVATE_MEDIA_PREFIXES = ("orders/", "order_previews/")
+
+def serve_media(request, path):
+    """Files under MEDIA_ROOT, checking access to print-order documents and previews first."""
+    # Only canonical names: the storage would resolve "x/../orders/..." past the prefix check
+    if posixpath.normpath(path) != path or any(part in ("", ".", "..") for part in path.split("/")):
+        raise Http404("No such file")
+    private = path.startswith(PRIVATE_MEDIA_PREFIXES)
+    if private:
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        orders = visible_print_orders(request.user).filter(models.Q(document=path) | models.Q(preview=path))
+        if not orders.exists():
+            raise Http404("No such file")
+    return serve_file(request, default_storage, path, private=private)
+
 @login_required
 def student_shop_orders(request):
     if request.user.role != 'student':
         return redirect('vendor_orders')
 
 
-    shop_orders = StudentShopOrder.objects.filter(item__student_vendor=request.user).select_related("item", "buyer")
+    shop_orders = vendor_orders_queryset(request.user, "student").select_related("item", "buyer")
 
     return render(request, 'store/student_vendor_orders.html', {
         'shop_orders': shop_orders,
+        'status_choices': StudentShopOrder.STATUS_CHOICES,
     })
 
 
+def _update_one_order_status(request, order_type, order_id):
+    """Moves one order to the POSTed status under the same transition rules as the bulk views."""
+    status = request.POST.get("status")
+    if status not in ALLOWED_TRANSITIONS[order_type]:
+        messages.error(request, "Unknown order status.")
+        return
+    result = bulk_transition(request.user, order_type, [order_id], status)[order_id]
+    if result == "not_found":
+        raise Http404("No such order")
+    if result == "invalid_transition":
+        messages.error(request, f"Order #{order_id} can't move to that status.")
+    elif result == "conflict":
+        messages.error(request, f"Order #{order_id} was changed meanwhile; try again.")
+
+
 @login_required
 @vendor_required
+@require_POST
 def update_order_status(request, order_type, order_id):
-    if order_type == "shop":
-        order = get_object_or_404(ShopOrder, id=order_id, item__vendor=request.user)
-        valid_statuses = dict(ShopOrder.STATUS_CHOICES)
-    elif order_type == "print":
-        order = get_object_or_404(Order, id=order_id, vendor=request.user)
-        valid_statuses = dict(Order.STATUS_CHOICES)
-    else:
-        return redirect("vendor_orders")
+    if order_type in ("print", "shop"):
+        _update_one_order_status(request, order_type, order_id)
+    return redirect("vendor_orders")
 
-    if request.method == "POST":
-        new_status = request.POST.get("status")
-        if new_status in valid_statuses:
-            order.status = new_status
-            order.save()
-        return redirect("vendor_orders")
-    
 @login_required
 @student_required
+@require_POST
 def update_student_order_status(request, order_type, order_id):
-    print("Here")
-
-    order = get_object_or_404(StudentShopOrder, id=order_id, item__student_vendor=request.user)
-    valid_statuses = dict(StudentShopOrder.STATUS_CHOICES)
-
-
-    if request.method == "POST":
-        new_status = request.POST.get("status")
-        if new_status in valid_statuses:
-            order.status = new_status
-            order.save()
-        return redirect("student_vendor_orders")
+    _update_one_order_status(request, "student", order_id)
+    return redirect("student_vendor_orders")
 
 def test_view(request):
     #db pull update, crud
@@ -540,11 +935,13 @@ def delivery_details_view(request, order_id):
     return render(request, "store/delivery_details.html", {"order": order})
 
 @login_required
-def create_checkout_session(request, order_id):
-    order = get_object_or_404(ShopOrder, id=order_id, buyer=request.user)
+async def create_checkout_session(request, order_id):
+    user = await request.auser()
+    order = await aget_object_or_404(ShopOrder.objects.select_related("item"), id=order_id, buyer=user)
     YOUR_DOMAIN = "http://127.0.0.1:8000"
 
-    checkout_session = stripe.checkout.Session.create(
+    checkout_session = await create_stripe_session(
+        request,
         payment_method_types=['card'],
         line_items=[{
             'price_data': {
@@ -567,7 +964,7 @@ def create_checkout_session(request, order_id):
 
     
     order.stripe_session_id = checkout_session.id
-    order.save(update_fields=["stripe_session_id"])
+    await order.asave(update_fields=["stripe_session_id"])
 
     return JsonResponse({'id': checkout_session.id})
 
@@ -585,53 +982,55 @@ def create_checkout_session(request, order_id):
 #     return render(request, "store/payment_success.html")
 
 @login_required
-def payment_success(request):
+async def payment_success(request):
     session_id = request.GET.get("session_id")
     if not session_id:
         return HttpResponse("No session_id provided", status=400)
 
+    if settings.STRIPE_WEBHOOK_SECRET:
+        # The webhook consumer places the orders; this page only reports on them
+        return await sync_to_async(_payment_status)(request, session_id)
+
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
-    except Exception as e:
-        messages.error(request, f"Invalid session: {e}")
+        session = await retrieve_checkout_session(request, session_id)
+    except stripe.StripeError as e:
+        await sync_to_async(messages.error)(request, f"Invalid session: {e}")
         return redirect("home")
 
     if session.payment_status == "paid":
-        # Get user and cart from session metadata
-        user_id = session.metadata.get("user_id")
-        user = CustomUser.objects.get(id=user_id)
-        cart = Cart.objects.get(user=user)
-        
-        # Get delivery details from user's session
-        delivery_details_dict = request.session.get('delivery_details', {})
-        delivery_info = (
-            f"Name: {delivery_details_dict.get('name', 'N/A')}\n"
-            f"Phone: {delivery_details_dict.get('phone', 'N/A')}\n"
-            f"Address: {delivery_details_dict.get('address', 'N/A')}"
-        )
+        return await sync_to_async(_fulfil_paid_session)(request, session)
+    else:
+        await sync_to_async(messages.error)(request, "Payment was not successful.")
+        return redirect("payment_cancel")
 
-        # Create a separate ShopOrder for each item in the cart
-        for cart_item in cart.items.all():
-            ShopOrder.objects.create(
-                buyer=user,
-                item=cart_item.item,
-                quantity=cart_item.quantity,
-                status="pending",  # Set initial status
-                payment_status="Paid",
-                delivery_details=delivery_info,
-                stripe_session_id=session_id
-            )
+def _payment_status(request, session_id):
+    placed = ShopOrder.objects.filter(
+        stripe_session_id=session_id, buyer=request.user, payment_status="Paid"
+    ).exists()
+    if placed and 'delivery_details' in request.session:
+        del request.session['delivery_details']
+    return render(request, "store/payment_success.html", {"pending": not placed})
+
+def _fulfil_paid_session(request, session):
+    # The same fulfilment as the webhook consumer: places a cart's orders or
+    # marks a single order paid; a replayed session id is a no-op
+    fulfil_checkout_session(session.to_dict())
+
+    # Clear delivery details from session
+    if 'delivery_details' in request.session:
+        del request.session['delivery_details']
         
-        # Clear the cart and delivery details from session
-        cart.items.all().delete()
-        if 'delivery_details' in request.session:
-            del request.session['delivery_details']
-            
-        return render(request, "store/payment_success.html")
+    return render(request, "store/payment_success.html")
 
-    else:
-        messages.error(request, "Payment was not successful.")
-        return redirect("payment_cancel")
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """Records a signed Stripe event in the ledger; fulfilment happens in the background."""
+    try:
+        record_event(request.body, request.headers.get("Stripe-Signature", ""))
+    except (ValueError, stripe.SignatureVerificationError):
+        return HttpResponse(status=400)
+    return HttpResponse(status=200)
 
 @login_required
 def payment_cancel(request):
@@ -681,15 +1080,14 @@ def add_to_cart(request, item_id):
         cart_item.save()
         # Refresh from DB to get the actual new quantity after F() expression
         cart_item.refresh_from_db() 
+
+    # Keep the cached badge count in step
+    new_cart_count = increment_cart_count(request.user.id)
     
     # --- NEW AJAX HANDLING ---
     is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
 
     if is_ajax:
-        # Re-calculate the total cart count
-        count_data = cart.items.aggregate(total_quantity=Sum('quantity'))
-        new_cart_count = count_data['total_quantity'] or 0
-        
         return JsonResponse({
             'success': True,
             'message': f"'{item.name}' was added to your cart.",
@@ -705,8 +1103,8 @@ def add_to_cart(request, item_id):
 @student_required
 def view_cart(request):
     """Displays the user's cart."""
-    cart, _ = Cart.objects.get_or_create(user=request.user)
-    return render(request, "store/view_cart.html", {"cart": cart})
+    cart_items, cart_total = read_cart(request.user.id, "item__derivatives")
+    return render(request, "store/view_cart.html", {"cart_items": cart_items, "cart_total": cart_total})
 
 @login_required
 @student_required
@@ -715,6 +1113,7 @@ def remove_from_cart(request, cart_item_id):
     cart_item = get_object_or_404(CartItem, id=cart_item_id, cart__user=request.user)
     item_name = cart_item.item.name
     cart_item.delete()
+    evict_cart_count(request.user.id)
     messages.success(request, f"'{item_name}' was removed from your cart.")
     return redirect("view_cart")
 
@@ -722,9 +1121,9 @@ def remove_from_cart(request, cart_item_id):
 @student_required
 def cart_checkout(request):
     """Displays the delivery details form for a cart checkout."""
-    cart, _ = Cart.objects.get_or_create(user=request.user)
+    cart_items, cart_total = read_cart(request.user.id)
     
-    if cart.items.count() == 0:
+    if not cart_items:
         messages.error(request, "Your cart is empty. Please add items before checking out.")
         return redirect("shop")
         
@@ -737,22 +1136,26 @@ def cart_checkout(request):
         }
         # Redirect to the payment page
         return render(request, "store/payment_cart.html", {
-            "cart": cart,
+            "cart_total": cart_total,
             "STRIPE_PUBLIC_KEY": settings.STRIPE_PUBLIC_KEY
         })
         
-    return render(request, "store/checkout.html", {"cart": cart})
+    return render(request, "store/checkout.html", {"cart_items": cart_items, "cart_total": cart_total})
 
 @login_required
 @student_required
-def create_cart_checkout_session(request):
+async def create_cart_checkout_session(request):
     """Creates a Stripe checkout session for the entire cart."""
-    cart = get_object_or_404(Cart, user=request.user)
+    user = await request.auser()
+    cart_items, _ = await sync_to_async(read_cart)(user.id)
+    delivery_details = await request.session.aget('delivery_details', {})
+    if not cart_items:
+        return JsonResponse({'error': 'Your cart is empty.'}, status=400)
     YOUR_DOMAIN = "http://127.0.0.1:8000"
 
     # Build the list of line items from the cart
     line_items = []
-    for cart_item in cart.items.all():
+    for cart_item in cart_items:
         line_items.append({
             'price_data': {
                 'currency': 'bdt',
@@ -764,11 +1167,16 @@ def create_cart_checkout_session(request):
             'quantity': cart_item.quantity,
         })
 
-    checkout_session = stripe.checkout.Session.create(
+    checkout_session = await create_stripe_session(
+        request,
         payment_method_types=['card'],
         line_items=line_items,
         metadata={
-            "user_id": request.user.id, # Pass user_id to identify on success
+            "user_id": user.id, # Pass user_id to identify on success
+            # Delivery details travel with the session for the webhook consumer
+            "delivery_name": (delivery_details.get('name') or '')[:500],
+            "delivery_phone": (delivery_details.get('phone') or '')[:500],
+            "delivery_address": (delivery_details.get('address') or '')[:500],
         },
         mode='payment',
         success_url=YOUR_DOMAIN + '/payment-success/?session_id={CHECKOUT_SESSION_ID}',
@@ -0,0 +1,89 @@
+"""
+Stripe webhook ledger. Every verified event is stored once as a StripeEvent
+and fulfilled by a background consumer, so the webhook answers straight
+away and Stripe's redeliveries are harmless.
+"""
+import json
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .background import run_after_commit
+from .cart import format_delivery_details, place_cart_orders
+from .models import ShopOrder, StripeEvent
+
+
+def fulfil_checkout_session(session):
+    """Places a paid cart's orders, or marks a single paid order as paid."""
+    if session.get("payment_status") != "paid":
+        # Delayed payment methods complete first and pay later
+        return
+    metadata = session.get("metadata") or {}
+    if "user_id" in metadata:
+        delivery_info = format_delivery_details(
+            metadata.get("delivery_name"), metadata.get("delivery_phone"), metadata.get("delivery_address")
+        )
+        place_cart_orders(metadata["user_id"], session["id"], delivery_info)
+    elif "order_id" in metadata:
+        ShopOrder.objects.filter(id=metadata["order_id"], stripe_session_id=session["id"]).update(
+            payment_status="Paid"
+        )
+
+
+# Event type -> handler taking the event's data object
+HANDLERS = {
+    "checkout.session.completed": fulfil_checkout_session,
+    "checkout.session.async_payment_succeeded": fulfil_checkout_session,
+}
+
+
+def record_event(payload, signature):
+    """
+    Verifies a webhook delivery and appends it to the ledger, scheduling its
+    fulfilment unless the event was already recorded. Raises ValueError or
+    stripe.SignatureVerificationError for deliveries that don't check out.
+    """
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        raise ValueError("STRIPE_WEBHOOK_SECRET is not set.")
+    event = stripe.Webhook.construct_event(payload, signature, settings.STRIPE_WEBHOOK_SECRET)
+    stored, created = StripeEvent.objects.get_or_create(
+        event_id=event.id,
+        defaults={"type": event.type, "payload": json.loads(payload)},
+    )
+    if created:
+        schedule_event(stored.pk)
+    return stored
+
+
+def schedule_event(event_pk):
+    """Processes the event on a worker thread once its row is committed."""
+    run_after_commit(
+        process_event, event_pk,
+        async_setting="STRIPE_EVENTS_ASYNC", pool="stripe-events", workers=settings.STRIPE_EVENT_WORKERS,
+    )
+
+
+def process_event(event_pk):
+    """
+    Runs the handler for a stored event and marks it processed. Events that
+    were already processed, or have no handler, are just marked. Failures
+    are recorded on the event and re-raised; handlers are idempotent, so
+    ``manage.py process_stripe_events`` can safely retry them.
+    """
+    event = StripeEvent.objects.get(pk=event_pk)
+    if event.processed_at:
+        return
+    handler = HANDLERS.get(event.type)
+    try:
+        with transaction.atomic():
+            if handler:
+                handler(event.payload["data"]["object"])
+            StripeEvent.objects.filter(pk=event.pk).update(
+                processed_at=timezone.now(), attempts=F("attempts") + 1, error=""
+            )
+    except Exception as e:
+        StripeEvent.objects.filter(pk=event.pk).update(attempts=F("attempts") + 1, error=repr(e))
+        raise
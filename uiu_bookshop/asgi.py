@@ -2,6 +2,8 @@
 ASGI config for uiu_bookshop project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn uiu_bookshop.asgi:application``)
+so the async checkout views wait on Stripe without holding a worker.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -31,6 +34,19 @@ ALLOWED_HOSTS = []
 STRIPE_PUBLIC_KEY = "pk_test_51SJx6GDs58Mmn85vOQZxmxoX7nYQrM3G9t1Vs8AYMgi6MGzm3Ip3BrtPrrYuTAMw6MzN37jBKm48lzuIoax51DZs00kui720uk"   # replace with your key
 STRIPE_SECRET_KEY = "sk_test_51SJx6GDs58Mmn85vD38a3yvSWZQW48qFRoH3dGgpCzI1KbwhRwEZl0r9FFEW4X1ZfiVpuczvxsbBERRhJqDqDYqu00Ap9nBuun"   # replace with your key
 
+# Stripe API calls made by the async checkout views. Set STRIPE_API_BASE to
+# a `manage.py run_fake_stripe` server to test or load-test checkout offline.
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE')
+STRIPE_TIMEOUT = 10  # seconds
+STRIPE_MAX_NETWORK_RETRIES = 2
+
+# Signing secret of the Stripe webhook endpoint (stripe/webhook/). When set,
+# orders are placed from webhook events by a pool of STRIPE_EVENT_WORKERS
+# threads and the success page only looks them up.
+STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+STRIPE_EVENT_WORKERS = 2
+STRIPE_EVENTS_ASYNC = True
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -45,6 +61,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.RequestProfilingMiddleware',  # only active with REQUEST_PROFILING
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,6 +71,24 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request SQL and timing profile: a Server-Timing header plus a JSON log
+# line on the core.profiling logger. Queries of the same shape repeated more
+# than REQUEST_PROFILING_REPEAT_THRESHOLD times are logged as likely N+1.
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING') == '1'
+REQUEST_PROFILING_REPEAT_THRESHOLD = 5
+REQUEST_PROFILING_SLOWEST = 3  # statements listed per request
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 ROOT_URLCONF = 'uiu_bookshop.urls'
 
 TEMPLATES = [
@@ -67,6 +102,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.cart_count',
             ],
         },
     },
@@ -78,12 +114,58 @@ WSGI_APPLICATION = 'uiu_bookshop.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default, set up for concurrent writers: WAL lets reads carry on
+# during a write, IMMEDIATE transactions take the write lock when they start
+# (a deferred one that later tries to write can fail at once with "database
+# is locked"), and writers queue for up to SQLITE_BUSY_TIMEOUT seconds.
+# Set DB_ENGINE=postgresql (plus the POSTGRES_* variables) to use
+# PostgreSQL through a connection pool instead (needs psycopg[pool]).
+# manage.py bench_db_writes compares their write throughput.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+SQLITE_BUSY_TIMEOUT = 20
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'uiu_bookshop'),
+            'USER': os.environ.get('POSTGRES_USER', ''),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', ''),
+            'PORT': os.environ.get('POSTGRES_PORT', ''),
+            # Pooled connections are reused by every thread; CONN_MAX_AGE must stay 0
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('POSTGRES_POOL_MIN', 2)),
+                    'max_size': int(os.environ.get('POSTGRES_POOL_MAX', 10)),
+                    'timeout': 10,
+                },
+            },
+        }
     }
-}
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            # Keep each worker thread's connection (and its page cache) between requests
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': SQLITE_BUSY_TIMEOUT,
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'  # durable at checkpoints; safe with WAL
+                    'PRAGMA mmap_size=134217728;'  # 128 MiB
+                    'PRAGMA cache_size=-32000;'  # 32 MiB
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown DB_ENGINE {DB_ENGINE!r}: use 'sqlite' or 'postgresql'.")
 
 
 # Password validation
@@ -125,6 +207,19 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# collectstatic writes content-hashed copies of the static files (cacheable
+# forever) plus .gz/.br variants of the text ones, for the front server to
+# serve from STATIC_ROOT. With DEBUG on, templates keep the plain names.
+# Run collectstatic before every deploy: with DEBUG off, a static file
+# missing from the manifest is an error.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "core.staticfiles.CompressedManifestStaticFilesStorage"},
+}
+# Smaller files are not worth compressing.
+STATIC_COMPRESS_MIN_SIZE = 256
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -137,4 +232,106 @@ AUTH_USER_MODEL = 'core.CustomUser'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media/'
 
+# Media is sent by core.views.serve_media after any access check. Set
+# MEDIA_ACCEL to "x-accel-redirect" (nginx, with an internal location at
+# MEDIA_ACCEL_PREFIX aliasing MEDIA_ROOT) or "x-sendfile" (Apache/lighttpd)
+# to let the front server transfer the bytes. Public media may be cached
+# for MEDIA_MAX_AGE seconds.
+MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_MAX_AGE = 24 * 60 * 60
+
+# Largest print-order document a student may upload, in bytes. No upload
+# is read past this size: the handler below stops parsing the request body
+# and hashes spooled files for the content-addressed document storage.
+MAX_DOCUMENT_UPLOAD_SIZE = 25 * 1024 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'core.uploads.HashingTemporaryFileUploadHandler',
+]
+
+# Print-order preflight (page count, colour pages, preview) and quoting.
+# Prices are in Tk per printed page.
+PREFLIGHT_WORKERS = 2
+PREFLIGHT_ASYNC = True
+PRINT_PRICE_PER_PAGE = '2.00'
+PRINT_PRICE_PER_COLOR_PAGE = '10.00'
+
+# How print orders without a chosen vendor are assigned: "least_outstanding",
+# "weighted_round_robin" or the dotted path of a callable (see core.assignment).
+ORDER_ASSIGNMENT_STRATEGY = 'least_outstanding'
+
 LOGIN_URL = 'login'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory is per process; switch to the file-based backend below when
+# running several workers so catalog invalidations are seen by all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'uiu-bookshop',
+    }
+    # 'default': {
+    #     'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    #     'LOCATION': BASE_DIR / 'cache',
+    # }
+}
+
+# Seconds a rendered catalog (shop and student shop) stays cached. Item and
+# category writes invalidate it straight away, so this is only a safety net.
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Seconds a student's cart badge count stays cached. Cart views update or
+# evict it themselves; the timeout covers carts emptied by item deletion.
+CART_COUNT_CACHE_TIMEOUT = 60 * 60
+
+# Items per page (and per "Load more") on the paginated shop listing.
+SHOP_PAGE_SIZE = 24
+
+# Identifies the running release. Pages that only change with the code
+# (home, about) use it as their ETag and are rendered once per deploy. Set
+# it to e.g. the git commit when deploying; when unset, a hash of the code,
+# templates and static files is used (core.page_cache.code_fingerprint).
+DEPLOY_ID = os.environ.get('DEPLOY_ID', '')
+
+# Seconds shared caches may keep the anonymous home/about pages and the
+# anonymous shop and student shop pages. Everyone else gets private pages
+# that are revalidated with their ETag on every visit.
+PUBLIC_PAGE_MAX_AGE = 10 * 60
+PUBLIC_CATALOG_MAX_AGE = 60
+
+# Default and largest ?limit= of a page from the catalog JSON API (api/v1/).
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Most listings returned by the full-text search page.
+SEARCH_RESULTS_LIMIT = 48
+
+# Orders per page in each section of the vendor work queue (vendor-orders/).
+VENDOR_ORDERS_PAGE_SIZE = 25
+
+# Most orders one bulk status change (vendor-orders/bulk-status/) may touch.
+BULK_STATUS_MAX_ORDERS = 200
+
+# Student listings per page of the vendor moderation queue (moderation/),
+# the most one moderation request may decide, and how long a vendor's
+# claim on a listing keeps other vendors off it.
+MODERATION_PAGE_SIZE = 25
+MODERATION_MAX_ITEMS = 100
+MODERATION_CLAIM_MINUTES = 15
+
+# Pending vendors per page of custom-admin/approve-vendors/. Rejected vendor
+# accounts are deactivated at once and deleted on a background thread,
+# VENDOR_DELETE_BATCH_SIZE accounts (and their cascades) per transaction.
+VENDOR_APPROVAL_PAGE_SIZE = 50
+VENDOR_DELETE_BATCH_SIZE = 50
+VENDOR_DELETES_ASYNC = True
+
+# Widths (px) of the WebP/JPEG copies made of each uploaded listing image,
+# and the worker threads that build them off the request thread.
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 960)
+IMAGE_DERIVATIVE_WORKERS = 2
+IMAGE_DERIVATIVES_ASYNC = True